@@ -0,0 +1,277 @@
+"""Scanning kernels for the flattened transition tables of the matchers.
+
+The kernels walk the columns of a text through the row-major transition table built by
+``AhoCorasickMatcher.finalize`` or ``KMPMatcher.finalize`` and record the matches into
+output arrays, so the hot loop only touches local variables and flat containers.
+"""
+
+import functools
+import re
+from array import array
+from collections.abc import Callable
+from types import CodeType
+
+# Column given by the translation table to the bytes outside of the alphabet, so the
+# flattened table only applies to alphabets of at most 255 symbols
+OUT_OF_ALPHABET = 0xFF
+
+# Source of the scanner specialized by compile_scan. The rows of GOTO are
+# premultiplied by the width, and accepting targets are stored complemented. The
+# loop is unrolled four times, the remaining columns are scanned one by one.
+_SCAN_SOURCE = """
+def scan(cols, state, offset, out_pos, out_state):
+    goto = GOTO
+    append_pos = out_pos.append
+    append_state = out_state.append
+    row = state * {width}
+    index = offset
+    end = len(cols) & ~3
+    it = iter(cols)
+    for col0, col1, col2, col3 in zip(it, it, it, it):
+        if (row := goto[row + col0]) < 0:
+            row = ~row
+            append_pos(index)
+            append_state(row // {width})
+        if (row := goto[row + col1]) < 0:
+            row = ~row
+            append_pos(index + 1)
+            append_state(row // {width})
+        if (row := goto[row + col2]) < 0:
+            row = ~row
+            append_pos(index + 2)
+            append_state(row // {width})
+        if (row := goto[row + col3]) < 0:
+            row = ~row
+            append_pos(index + 3)
+            append_state(row // {width})
+        index += 4
+    for index, col in enumerate(cols[end:], offset + end):
+        if (row := goto[row + col]) < 0:
+            row = ~row
+            append_pos(index)
+            append_state(row // {width})
+    return row // {width}
+"""
+
+# Source of the scanner skipping the runs of the root, added by compile_scan when
+# few columns leave the root. In the root, the next occurrence of one of them is
+# found in C, by ``bytes.find`` for a single column or else by the character class
+# START, and the columns are then scanned one by one until the root is reached
+# again. The skipping scanner is only used on the blocks where these columns are
+# rare enough, otherwise the restarts cost more than they save.
+_SKIP_SCAN_SOURCE = """
+def skip_scan(cols, state, offset, out_pos, out_state):
+    goto = GOTO
+    append_pos = out_pos.append
+    append_state = out_state.append
+    find = cols.find
+    search = START.search
+    view = memoryview(cols)
+    row = state * {width}
+    start = 0
+    while start < len(cols):
+        if not row:
+            {find_start}
+        index = offset + start
+        for col in view[start:]:
+            if (row := goto[row + col]) < 0:
+                row = ~row
+                append_pos(index)
+                append_state(row // {width})
+            elif not row:
+                break
+            index += 1
+        start = index - offset + 1
+    return row // {width}
+
+
+def scan_with_skip(cols, state, offset, out_pos, out_state):
+    if {count_start} * {skip_ratio} < len(cols):
+        return skip_scan(cols, state, offset, out_pos, out_state)
+    return scan(cols, state, offset, out_pos, out_state)
+"""
+
+# Finding the next column leaving the root, depending on the number of such columns
+_FIND_START_COL = """if (start := find({start_col}, start)) < 0:
+                return 0"""
+_SEARCH_START_COLS = """if (match := search(cols, start)) is None:
+                return 0
+            start = match.start()"""
+
+# Counting the columns leaving the root in a block, by deleting the others
+_COUNT_START_COL = "cols.count({start_col})"
+_COUNT_START_COLS = "len(cols.translate(None, ROOT_COLS))"
+
+# The skipping scanner is used on the blocks where at most one column in
+# SKIP_RATIO leaves the root
+SKIP_RATIO = 16
+
+# Most columns leaving the root for the skipping scanner to be generated, as the
+# restarts are only rare when few symbols can start a match
+SKIP_MAX_START_COLS = 8
+
+
+def column_table(alphabet_list: tuple[str, ...]) -> bytes:
+    """Build the translation table from bytes to columns of an alphabet.
+
+    Translating a text with the table, i.e. ``text.translate(table)``, replaces every
+    byte by its column in one pass, without any per-byte lookup in Python.
+
+    Args:
+        alphabet_list: The sorted alphabet characters, at most 255 of them, the
+            position of a character is its column
+
+    Returns:
+        bytes: 256-byte table giving the column of each byte value,
+            `OUT_OF_ALPHABET` for the bytes outside of the alphabet
+    """
+    table = bytearray([OUT_OF_ALPHABET]) * 256
+    for col, a in enumerate(alphabet_list):
+        if ord(a) <= 0xFF:
+            table[ord(a)] = col
+    return bytes(table)
+
+
+class _StringColumns(dict):
+    """Translation table of characters to columns, see `string_column_table`."""
+
+    def __missing__(self, key: int) -> int:
+        return OUT_OF_ALPHABET
+
+
+def string_column_table(alphabet_list: tuple[str, ...]) -> dict[int, int]:
+    """Build the translation table from characters to columns of an alphabet.
+
+    The counterpart of `column_table` for the strings which do not fit in bytes:
+    ``text.translate(table)`` replaces every character by the character of its
+    column, so the translated text encodes to latin-1 as the columns.
+
+    Args:
+        alphabet_list: The sorted alphabet characters, at most 255 of them, the
+            position of a character is its column
+
+    Returns:
+        dict[int, int]: The column of each character code, `OUT_OF_ALPHABET` for
+            the characters outside of the alphabet
+    """
+    return _StringColumns((ord(a), col) for col, a in enumerate(alphabet_list))
+
+
+def scan(
+    goto: array,
+    width: int,
+    accept: bytearray,
+    cols: bytes,
+    state: int,
+    offset: int,
+    out_pos: array,
+    out_state: array,
+) -> int:
+    """Run the DFA over a block of columns and collect the accepting steps.
+
+    Args:
+        goto: Row-major transition table, ``goto[state * width + col]``
+        width: Number of columns of the transition table
+        accept: Non-zero for accepting states
+        cols: The block to scan, already translated from bytes to columns, which
+            must all be within the table
+        state: The state to start from
+        offset: Position of the first byte of the block in the whole text
+        out_pos: Receives the position of the last byte of each match
+        out_state: Receives the accepting state of each match
+
+    Returns:
+        int: The state after the last byte of the block
+    """
+    append_pos = out_pos.append
+    append_state = out_state.append
+    for index, col in enumerate(cols, offset):
+        state = goto[state * width + col]
+        if accept[state]:
+            append_pos(index)
+            append_state(state)
+    return state
+
+
+def entry_typecode(bound: int) -> str:
+    """Get the narrowest array typecode holding the entries of a transition table.
+
+    A narrower table takes less memory and cache for the same lookups.
+
+    Args:
+        bound: Bound of the absolute values of the entries, which range from
+            ``-bound`` to ``bound - 1``
+
+    Returns:
+        str: The typecode, ``"b"``, ``"h"`` or ``"i"``
+    """
+    for typecode in ("b", "h"):
+        if bound <= 1 << (8 * array(typecode).itemsize - 1):
+            return typecode
+    return "i"
+
+
+@functools.lru_cache(maxsize=256)
+def compile_source(source: str) -> CodeType:
+    """Compile the source of a scanner, once per source.
+
+    The source only depends on the width of the table and the columns leaving the
+    root, so the matchers over the same alphabet share the compiled code, and only
+    run it in their own namespace.
+
+    Args:
+        source: Source of the scanner
+
+    Returns:
+        CodeType: The compiled module code
+    """
+    return compile(source, "<scan>", "exec")
+
+
+def compile_scan(goto: array, width: int, accept: bytearray) -> Callable:
+    """Generate a scanner specialized on a flattened transition table.
+
+    The transition table and the alphabet width are baked into the scanner as
+    constants: each row index is premultiplied by the width, and the accepting
+    states are folded into the sign of the table entries, so a step is a single
+    load and a sign test. The entries are stored in the narrowest integer type
+    holding them, see `entry_typecode`. The source is compiled once per width, see
+    `compile_source`.
+
+    Args:
+        goto: Row-major transition table, ``goto[state * width + col]``
+        width: Number of columns of the transition table
+        accept: Non-zero for accepting states
+
+    Returns:
+        Callable: The scanner, with the signature of `scan` without the table
+            arguments
+    """
+    # The entry of each target state, mapped over the table in C
+    rows = [
+        ~(state * width) if accepting else state * width
+        for state, accepting in enumerate(accept)
+    ]
+    table = array(
+        entry_typecode(len(accept) * width), list(map(rows.__getitem__, goto))
+    )
+    namespace = {"GOTO": table}
+    source = _SCAN_SOURCE.format(width=width)
+    # Columns leaving the root, the others loop on it
+    leaving = [col for col in range(width) if goto[col]]
+    skip = 0 < len(leaving) <= SKIP_MAX_START_COLS and len(leaving) < width
+    if skip:
+        if len(leaving) == 1:
+            find_start, count_start = _FIND_START_COL, _COUNT_START_COL
+        else:
+            find_start, count_start = _SEARCH_START_COLS, _COUNT_START_COLS
+        source += _SKIP_SCAN_SOURCE.format(
+            width=width,
+            find_start=find_start.format(start_col=leaving[0]),
+            count_start=count_start.format(start_col=leaving[0]),
+            skip_ratio=SKIP_RATIO,
+        )
+        namespace["START"] = re.compile(b"[" + re.escape(bytes(leaving)) + b"]")
+        namespace["ROOT_COLS"] = bytes(sorted(set(range(256)).difference(leaving)))
+    exec(compile_source(source), namespace)  # pylint: disable=exec-used
+    return namespace["scan_with_skip" if skip else "scan"]
@@ -7,55 +7,54 @@ The main class AhoCorasickMatcher supports both pre-computed and on-the-fly
 state transitions for pattern matching.
 """
 
+from array import array
 from collections.abc import Generator
+from typing import Any
 from strings.dfa import DFA, State, TransitionType
+from strings._ac_kernel import OUT_OF_ALPHABET, column_table, compile_scan, scan
+from strings.utils import Text, column_blocks
 
+# Children of each state of a trie, by column of the symbol
+Trie = list[dict[int, State]]
 
-def alphabet_set_from_alphabets(alphabets: str | None, patterns: list[str]) -> set[str]:
-    """Build an alphabet set from a list of patterns.
+# Number of bytes handed to the scanning kernel at once
+SCAN_BLOCK_SIZE = 1 << 16
+
+
+def alphabet_set_from_alphabets(
+    alphabets: str | None, patterns: list[str]
+) -> tuple[str, ...]:
+    """Build a dense alphabet from a list of patterns.
 
     Args:
         alphabets: A string containing the alphabet characters
         patterns: List of patterns
 
     Returns:
-        A set of unique characters from the input string
+        tuple[str, ...]: The sorted unique characters, indexed by column
     """
     # If alphabet is not provided, build it dynamically from the patterns
     if alphabets is None:
-        alphabet_set = set()
-        for pattern in patterns:
-            for sym in pattern:
-                alphabet_set.add(sym)
+        alphabet_set = set().union(*patterns)
     else:
         alphabet_set = set(alphabets)
-    return alphabet_set
+    return tuple(sorted(alphabet_set))
 
 
-def precompute_possible_transitions(
-    dfa: DFA, index: int, alphabet_set: set[str], fail_functions: list[int]
-) -> None:
-    """Pre-compute all possible transitions for a given state.
+def compose_transitions(first: array, second: array) -> array:
+    """Compose two state transition vectors.
 
-    This function computes and stores all possible transitions for a given state
-    based on the alphabet set. It is used to pre-compute transitions for all states
-    in the DFA.
+    A transition vector maps every state to its next state, i.e. ``vector[state]``.
+    The composition applies ``first`` and then ``second``.
 
     Args:
-        dfa (DFA): The DFA object.
-        index (int): The index of the state for which transitions are pre-computed.
-        alphabet_set (set[str]): The set of alphabet characters.
-        fail_functions(list[int]): The fail functions.
-
-    Raises:
-        ValueError: If the transition from the current state to any alphabet character
-            is not defined.
+        first (array): The transition vector applied first
+        second (array): The transition vector applied second
+
+    Returns:
+        array: The transition vector equivalent to applying both vectors in order
     """
-    for a in alphabet_set:
-        if not dfa.has_transition(index, a):
-            if (to_state := dfa.transition(fail_functions[index - 1], a)) is None:
-                raise ValueError(f"Invalid transition from {index} with {a}")
-            dfa.add_transition(index, a, to_state, TransitionType.FAILURE)
+    return array("i", map(second.__getitem__, first))
 
 
 class AhoCorasickMatcher:
@@ -70,7 +69,22 @@ class AhoCorasickMatcher:
             or computed on-the-fly during pattern matching.
         dfa (DFA): The underlying deterministic finite automaton used for pattern matching.
         fail_functions (list[int]): Array of failure function values for each state.
-        pattern_map (dict): Mapping of states to their corresponding pattern prefixes.
+        pattern_map (dict): Mapping of the accepting states to their pattern, a view of
+            ``patterns_by_state``.
+        patterns_by_state (list[str | None]): The pattern of each accepting state,
+            indexed by state, None for the other states.
+        patterns (list[str]): The patterns of the matcher, indexed by pattern id.
+        pattern_ids (list[int | None]): The pattern id of each accepting state,
+            indexed by state, None for the other states.
+        pattern_len (array): The length of the pattern of each state.
+        goto (array | None): Row-major flattened transition table of the precomputed DFA,
+            ``goto[state * width + col]`` is the next state. None when transitions are
+            computed on-the-fly or the columns do not fit in a byte.
+        width (int): Number of columns of ``goto``, i.e. the size of the alphabet.
+        col_table (bytes | None): Translation table from bytes to the columns of
+            ``goto``, see `column_table`, also set for the search through the DFA.
+        accept_mask (bytearray | None): Non-zero for accepting states.
+        _scan (Callable | None): Scanner specialized on ``goto`` by `compile`.
 
     Example:
         >>> patterns = ["ABABAC", "ABCABAB"]
@@ -80,130 +94,165 @@ class AhoCorasickMatcher:
         ...     print(f"Found {pattern} at position {pos}")
     """
 
-    def _initialize_dfa(
-        self, alphabets: set[str], patterns: list[str]
-    ) -> tuple[DFA, dict]:
-        """Create Trie structure from a given pattern
+    def _build_trie(
+        self, alphabet_list: tuple[str, ...], patterns: list[str]
+    ) -> tuple[Trie, dict[State, str]]:
+        """Create the trie of the patterns, over the columns of their symbols.
+
+        Each pattern is converted once to the columns of its symbols, so the trie and
+        the failure functions are built on small ints without hashing any string.
 
         Args:
-            alphabets(str): The alphabets of the DFA
+            alphabet_list(tuple[str, ...]): The alphabets of the DFA, indexed by column
             patterns(list[str]): The list of patterns to match
         Return:
             Tuple of:
-                - DFA: The DFA corresponds to the Trie
-                - dict: The state name
-        """
-
-        dfa = DFA(alphabets=alphabets)
-        dfa.add_state(is_accepting=False, is_initial=True)
-
-        # Build trie structure by adding each pattern and store the pattern for each state
-        pattern_map = {0: ""}
+                - Trie: The children of each state, by column
+                - dict: The pattern of each accepting state
 
+        Raises:
+            ValueError: If a pattern contains a symbol outside of the alphabet
+        """
+        col_of = {a: col for col, a in enumerate(alphabet_list)}
+        trie: Trie = [{}]
+        pattern_map = {}
         for pattern in patterns:
-            pmap = self._add_pattern(dfa, pattern)
-            pattern_map.update(pmap)
-
-        # Initialize failure transitions for the root state
-        self._initialize_root(alphabets=alphabets, dfa=dfa)
-        return dfa, pattern_map
+            try:
+                cols = [col_of[sym] for sym in pattern]
+            except KeyError as e:
+                raise ValueError(
+                    f"Symbol {e.args[0]} does not exist {set(alphabet_list)}"
+                ) from e
+            pattern_map[self._add_pattern(trie, cols)] = pattern
+        return trie, pattern_map
+
+    def _add_pattern(self, trie: Trie, cols: list[int]) -> State:
+        """Adds a pattern to the trie by creating the necessary states.
 
-    def _add_pattern(self, dfa: DFA, pattern: str) -> dict[State, str]:
-        """Adds a pattern to the DFA by creating necessary states and transitions.
         Args:
-            dfa (DFA): The deterministic finite automaton to add the pattern to
-            pattern (str): The string pattern to be added to the DFA
+            trie (Trie): The trie to add the pattern to
+            cols (list[int]): The columns of the symbols of the pattern
 
         Returns:
-            dict[State, str]: A mapping of states to their corresponding pattern prefixes
+            State: The state reached at the end of the pattern
         """
+        state = 0
+        for col in cols:
+            # Follow the existing transitions, and create the missing states
+            if (next_state := trie[state].get(col)) is None:
+                next_state = len(trie)
+                trie.append({})
+                trie[state][col] = next_state
+            state = next_state
+        return state
 
-        # Start from the initial state of the DFA
-        if dfa.initial_state is None:
-            raise ValueError("DFA has no initial state")
-        state = dfa.initial_state
-        pattern_map = {}
-
-
-        # Try to follow existing transitions in the DFA for the current pattern
-        i = 0
-        new_state: int | None = None
-        while i < len(pattern) and (new_state := dfa.transition(state, pattern[i])):
-            i = i + 1
-            state = new_state
-
-        # If we couldn't follow existing transitions all the way (new_state is None)
-        # or we need to add new states for the remaining characters
-        if new_state is None:
-            # Create new states for the remaining characters in the pattern
-            for j in range(i, len(pattern)):
-                # Store the current prefix of the pattern in the pattern map
-
-                # Create a new state, marking it as accepting if it's the last character
-                added_state = dfa.add_state(
-                    is_accepting=(j == len(pattern) - 1), is_initial=False
-                )
-                pattern_map[added_state] = pattern[:j]
-
-                # Add a transition from current state to new state with the current character
-                dfa.add_transition(
-                    from_state=state,
-                    to_state=added_state,
-                    symbol=pattern[j],
-                    transition_type=TransitionType.SUCCESS,
-                )
-                state = added_state
-
-            # Store the complete pattern in the pattern map for the final state
-            pattern_map[state] = pattern[: j + 1]
-
-        elif i == len(pattern):
-            # We followed existing transitions and reached the end of the pattern
-            # no need to create new state, and mark the final state as accepting
-            dfa.set_accepting(new_state, True)
-        return pattern_map
+    def _initialize_dfa(
+        self,
+        alphabet_list: tuple[str, ...],
+        trie: Trie,
+        pattern_map: dict[State, str],
+        goto: array | None = None,
+    ) -> DFA:
+        """Create the DFA over the flat transition table of the automaton.
 
-    def _initialize_root(self, alphabets: set[str], dfa: DFA) -> None:
-        """Initialize failure transitions for the root state (state 0) of the DFA.
+        The table is handed to the DFA at once, the success transitions are the
+        ones of the trie, and all the others are failure transitions.
 
         Args:
-            alphabets (set[str]): The set of possible characters in the alphabet
-            dfa (DFA): The deterministic finite automaton to initialize
+            alphabet_list(tuple[str, ...]): The alphabets of the DFA, indexed by column
+            trie (Trie): The children of each state, by column
+            pattern_map (dict[State, str]): The pattern of each accepting state
+            goto (array | None): The precomputed transition table, when None the DFA
+                only holds the success transitions of the trie
+        Return:
+            DFA: The DFA corresponds to the Trie
+        """
+        width = len(alphabet_list)
+        if goto is None:
+            table = array("i", [-1]) * (len(trie) * width)
+            failure_mask = bytearray(len(table))
+            for state, children in enumerate(trie):
+                row = state * width
+                for col, child in children.items():
+                    table[row + col] = child
+        else:
+            table = goto
+            failure_mask = bytearray(b"\x01") * len(table)
+            for state, children in enumerate(trie):
+                row = state * width
+                for col in children:
+                    failure_mask[row + col] = 0
+        return DFA.from_table(
+            set(alphabet_list), table, set(pattern_map), failure_mask=failure_mask
+        )
+
+    def _compute_fail_functions(self, trie: Trie, fail_functions: list[int]) -> None:
+        """Compute the failure functions of the trie.
+
+        The states are processed one breadth-first level at a time, and the failure
+        state of each child is found by following the failure links of its parent
+        until a state has a transition on the same column.
 
-        This method adds self-loop failure transitions from the root state
-        for any character that doesn't have an existing success transition.
-        Only executes if compute_transitions is True.
+        Args:
+            trie (Trie): The children of each state, by column
+            fail_functions (list[int]): Receives the failure functions
         """
-        if self.compute_transitions:
-            for a in alphabets:
-                if not dfa.has_transition(0, a):
-                    dfa.add_transition(
-                        from_state=0,
-                        to_state=0,
-                        symbol=a,
-                        transition_type=TransitionType.FAILURE,
-                    )
+        # The children of the root fail to the root
+        level = list(trie[0].values())
+        while level:
+            next_level = []
+            for index in level:
+                for col, child in trie[index].items():
+                    fail_state = fail_functions[index - 1]
+                    while (to_state := trie[fail_state].get(col)) is None:
+                        if fail_state == 0:
+                            to_state = 0
+                            break
+                        fail_state = fail_functions[fail_state - 1]
+                    fail_functions[child - 1] = to_state
+                    next_level.append(child)
+            level = next_level
+
+    def _precompute_goto(
+        self, trie: Trie, width: int, fail_functions: list[int]
+    ) -> array:
+        """Compute the flattened transition table and the failure functions.
+
+        The states are processed one breadth-first level at a time, so the row of the
+        failure state of each state, which is on a shallower level, is complete by
+        the time it is needed: the row of a state is a copy of the row of its
+        failure state, overwritten by its own success transitions. The failure state
+        of each child is read from that same row while the level is processed, which
+        builds the next level without walking the trie again.
 
-    def _initialize_top_level(
-        self, sym: str, index: int, alphabets: set[str], dfa: DFA
-    ) -> None:
-        """Initializes the top-level states of the Aho-Corasick automaton (the states directly connected from the root).
         Args:
-            sym(str): The transition from the root
-            index(int): The index of the top level state
-            alphabets (str): The set of possible characters in the alphabet
-            dfa (DFA): The deterministic finite automaton to initialize
+            trie (Trie): The children of each state, by column
+            width (int): The size of the alphabet
+            fail_functions (list[int]): Receives the failure functions
 
+        Returns:
+            array: Row-major table, ``goto[state * width + col]`` is the next state
         """
-        if self.compute_transitions:
-            for a in alphabets:
-                if not dfa.transition(index, a):
-                    dfa.add_transition(
-                        from_state=index,
-                        to_state=index if sym == a else 0,
-                        symbol=a,
-                        transition_type=TransitionType.FAILURE,
-                    )
+        goto = array("i", [0]) * (len(trie) * width)
+        for col, child in trie[0].items():
+            goto[col] = child
+
+        # Pairs of (state, failure state), the children of the root fail to the root
+        level = [(child, 0) for child in trie[0].values()]
+        while level:
+            next_level = []
+            for index, fail_state in level:
+                fail_functions[index - 1] = fail_state
+                # Gather the row of the failure state, then apply the success
+                # transitions
+                fail_row = fail_state * width
+                row = index * width
+                goto[row : row + width] = goto[fail_row : fail_row + width]
+                for col, child in trie[index].items():
+                    goto[row + col] = child
+                    next_level.append((child, goto[fail_row + col]))
+            level = next_level
+        return goto
 
     def __init__(
         self,
@@ -229,40 +278,183 @@ class AhoCorasickMatcher:
                 raise ValueError("Empty patterns")
         self.compute_transitions = compute_transitions
 
-        alphabet_set = alphabet_set_from_alphabets(alphabets, patterns)
+        alphabet_list = alphabet_set_from_alphabets(alphabets, patterns)
 
-        # Initialize the DFA (trie structure) and get mapping of states to their corresponding patterns
-        dfa, pattern_map = self._initialize_dfa(alphabet_set, patterns)
+        # Build the trie on the columns of the symbols, and get the mapping of the
+        # accepting states to their patterns
+        trie, pattern_map = self._build_trie(alphabet_list, patterns)
 
         # Initialize failure functions array for pattern matching
         # fail_functions[i] represents where to go when match fails at state i+1
-        fail_functions = [0] * dfa.n_states()
+        fail_functions = [0] * len(trie)
 
         # Process each state in breadth-first order to build failure functions and transitions
-        for parent, sym, index in list(dfa.bfs_traverse()):
-            if parent == 0:
-                # Special handling for states directly connected to root
-                self._initialize_top_level(sym, index, alphabet_set, dfa)
-            else:
-                # For other states: compute failure function and additional transitions if needed
-                fail_functions[index - 1] = (
-                    dfa.transition(fail_functions[parent - 1], sym) or 0
-                )
-                if compute_transitions:
-                    # Pre-compute all possible transitions for this state
-                    precompute_possible_transitions(
-                        dfa, index, alphabet_set, fail_functions
-                    )
+        goto = None
+        if compute_transitions:
+            goto = self._precompute_goto(trie, len(alphabet_list), fail_functions)
+        else:
+            self._compute_fail_functions(trie, fail_functions)
+        dfa = self._initialize_dfa(alphabet_list, trie, pattern_map, goto)
 
         self.fail_functions = fail_functions
         self.dfa = dfa
         self.pattern_map = pattern_map
+        self.finalize(goto)
 
-    def search(self, text: str) -> Generator[tuple[int, str]]:
+    @property
+    def pattern_map(self) -> dict[State, str]:
+        """Mapping of the accepting states to their pattern."""
+        return {
+            state: pattern
+            for state, pattern in enumerate(self.patterns_by_state)
+            if pattern is not None
+        }
+
+    @pattern_map.setter
+    def pattern_map(self, pattern_map: dict[State, str]) -> None:
+        """Store the patterns of the accepting states into per-state arrays.
+
+        Args:
+            pattern_map (dict[State, str]): Mapping of states to their pattern, only
+                the accepting states of the DFA are kept.
+        """
+        patterns_by_state: list[str | None] = [None] * self.dfa.n_states()
+        for state in self.dfa.accepting_states:
+            patterns_by_state[state] = pattern_map[state]
+        self.patterns_by_state = patterns_by_state
+
+        # The pattern ids follow the order of the map, which is the order of the
+        # patterns when the matcher is built from them
+        pattern_ids: list[int | None] = [None] * len(patterns_by_state)
+        pattern_len = array("i", [0]) * len(patterns_by_state)
+        patterns = []
+        for state in pattern_map:
+            if (pattern := patterns_by_state[state]) is not None:
+                pattern_ids[state] = len(patterns)
+                pattern_len[state] = len(pattern)
+                patterns.append(pattern)
+        self.patterns = patterns
+        self.pattern_ids = pattern_ids
+        self.pattern_len = pattern_len
+
+    def finalize(self, goto: array | None = None) -> None:
+        """Prepare the lookup tables used by search.
+
+        A precomputed DFA is flattened into contiguous tables.
+
+        The transitions are laid out row-major in a single int array, so that each
+        step of the search is one indexed load ``goto[state * width + col]``.
+        Only applies when transitions are precomputed, complete, and the alphabet has
+        at most 254 symbols, so the columns fit in a byte; otherwise the DFA is used
+        directly. The translation table of the bytes to the columns is prepared
+        whenever the columns fit in a byte, so the search through the DFA also runs
+        over columns, and the symbols are looked up as integers rather than
+        strings.
+
+        Args:
+            goto (array | None): The flattened table when already computed,
+                otherwise it is built from the DFA.
+        """
+        self._scan = None
+        self.goto = None
+        self.width = 0
+        self.col_table = None
+        self.accept_mask = None
+        alphabet_list = self.dfa.symbols
+        if len(alphabet_list) >= OUT_OF_ALPHABET:
+            return
+        self.col_table = self.dfa.col_table
+        if not self.compute_transitions:
+            return
+
+        width = len(alphabet_list)
+        if goto is None:
+            # The flat table of the DFA, when no transition is missing
+            if -1 in self.dfa.table:
+                return
+            goto = array("i", self.dfa.table)
+
+        self.goto = goto
+        self.width = width
+        self.accept_mask = self.dfa.accept_mask
+        self.compile()
+
+    def compile(self) -> None:
+        """Generate a scanner specialized on the flattened DFA.
+
+        The scanner is generated by `strings._ac_kernel.compile_scan`, it reads the
+        columns of the text, already translated with `col_table`, and is stored as
+        `_scan`.
+        """
+        self._scan = None
+        if self.goto is not None:
+            self._scan = compile_scan(self.goto, self.width, self.accept_mask)
+
+    def __getstate__(self) -> dict:
+        """Drop the generated scanner, which cannot be pickled.
+
+        Returns:
+            dict: The attributes of the matcher without `_scan`
+        """
+        state = self.__dict__.copy()
+        state["_scan"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore the attributes and regenerate the scanner.
+
+        Args:
+            state (dict): The attributes returned by `__getstate__`
+        """
+        self.__dict__.update(state)
+        self.compile()
+
+    def _follow_failures(self, state: State, col: int) -> State:
+        """Compute a missing transition by following the failure links.
+
+        The transition found is cached in the DFA for `state`, and for the
+        intermediate states of the failure chain, which all lead to the same state
+        on this symbol, so later misses from those states are a single lookup in
+        the flat table.
+
+        Args:
+            state (State): The state without a transition on the symbol, the caller
+                must have checked the transition is missing
+            col (int): The column of the input symbol
+
+        Returns:
+            State: The next state
+        """
+        table, width = self.dfa.table, self.dfa.width
+        chain = [state]
+        to_state = 0
+        # Keep following failure links until we either find a valid transition
+        # for the current character, or reach the root state
+        while chain[-1] != 0:
+            fail_state = self.fail_functions[chain[-1] - 1]
+            if (found := table[fail_state * width + col]) >= 0:
+                to_state = found
+                break
+            chain.append(fail_state)
+
+        # Cache the computed transition for future use, for the states of the
+        # chain. They are known to be missing since their lookups failed
+        symbol = self.dfa.symbols[col]
+        for missing in chain:
+            self.dfa.add_transition(
+                missing,
+                symbol=symbol,
+                to_state=to_state,
+                transition_type=TransitionType.FAILURE,
+            )
+        return to_state
+
+    def search(self, text: Text) -> Generator[tuple[int, str]]:
         """Search for all occurrences of patterns in the input text.
 
         Args:
-            text (str): The input text to search through.
+            text (Text): The input text to search through. Buffers such as bytes
+                are searched one byte per symbol, and the positions are byte offsets.
 
         Yields:
             tuple[int, str]: A tuple containing:
@@ -274,52 +466,150 @@ class AhoCorasickMatcher:
             >>> for pos, pattern in matcher.search("ABABCABABABABAC"):
             ...     print(f"Found {pattern} at position {pos}")
         """
+        return self._search(text, self.patterns_by_state)
+
+    def search_ids(self, text: Text) -> Generator[tuple[int, int]]:
+        """Search for all occurrences of patterns, identifying them by their id.
+
+        The matches carry the index of the pattern in `patterns` rather than the
+        pattern itself, which suits callers that count or group the matches.
+
+        Args:
+            text (Text): The input text to search through, see :meth:`search`.
+
+        Yields:
+            tuple[int, int]: A tuple containing:
+                - Position (index) where a pattern match begins
+                - The id of the matched pattern, its index in `patterns`
+
+        Example:
+            >>> matcher = AhoCorasickMatcher(["AB", "BC"], True)
+            >>> list(matcher.search_ids("ABC"))
+            [(0, 0), (1, 1)]
+        """
+        return self._search(text, self.pattern_ids)
+
+    def _search(self, text: Text, labels: list) -> Generator[tuple[int, Any]]:
+        """Search for all occurrences of patterns in the input text.
+
+        Args:
+            text (Text): The input text to search through, see :meth:`search`.
+            labels (list): The value yielded for the matches of each accepting
+                state, indexed by state.
+
+        Yields:
+            tuple[int, Any]: The position where a pattern match begins, and the
+                label of its accepting state
+        """
         state = 0
-        if self.compute_transitions:
-            # All transitions are pre-computed, allowing direct state transitions
-            for index, sym in enumerate(text):
-                if (new_state := self.dfa.transition(state, sym)) is None:
-                    raise ValueError("Error in DFA definition")
-                state = new_state
-
-                if self.dfa.is_accepting_state(state):
-                    pattern = self.pattern_map[state]
-                    yield (index - len(pattern) + 1), pattern
+        pattern_len = self.pattern_len
+        if self.goto is not None:
+            # Flattened transitions: the text is encoded once, and each block is
+            # translated to columns before the compiled scanner runs over it
+            out_pos, out_state = array("i"), array("i")
+            for offset, cols in column_blocks(
+                self.dfa, self.col_table, text, SCAN_BLOCK_SIZE
+            ):
+                state = self._scan(
+                    cols,
+                    state,
+                    offset,
+                    out_pos,
+                    out_state,
+                )
+                for index, accepting in zip(out_pos, out_state):
+                    yield (
+                        index - pattern_len[accepting] + 1,
+                        labels[accepting],
+                    )
+                del out_pos[:], out_state[:]
         else:
-            # Compute transitions on-the-fly using failure functions
-            for index, sym in enumerate(text):
-                if (new_state := self.dfa.transition(state, sym)) is not None:
+            # Look up the flat transition table of the DFA directly, over the
+            # columns of the text
+            table, width = self.dfa.table, self.dfa.width
+            accept_mask = self.dfa.accept_mask
+            for offset, cols in column_blocks(
+                self.dfa, self.col_table, text, SCAN_BLOCK_SIZE
+            ):
+                for index, col in enumerate(cols, offset):
+                    if (new_state := table[state * width + col]) < 0:
+                        if self.compute_transitions:
+                            # All transitions are pre-computed, none can be missing
+                            raise ValueError("Error in DFA definition")
+                        # No direct transition found - follow failure links
+                        new_state = self._follow_failures(state, col)
                     state = new_state
-                else:
-                    # No direct transition found - follow failure links until we find a valid transition
-                    fail_functions_index = (state - 1) if state > 0 else 0
-                    transition_state = 0
-
-                    # Keep following failure links until we either:
-                    # 1. Find a valid transition for current character, or
-                    # 2. Reach the root state (fail_functions_index = 0)
-                    while (
-                        not (
-                            transition_state := self.dfa.transition(
-                                self.fail_functions[fail_functions_index], sym
-                            )
-                            or 0
-                        )
-                        and fail_functions_index > 0
-                    ):
-                        fail_functions_index = self.fail_functions[fail_functions_index]
-
-                    # Cache the computed transition for future use
-                    if not self.dfa.has_transition(state, sym):
-                        self.dfa.add_transition(
-                            state,
-                            symbol=sym,
-                            to_state=transition_state,
-                            transition_type=TransitionType.FAILURE,
+
+                    if accept_mask[state]:
+                        yield (
+                            index - pattern_len[state] + 1,
+                            labels[state],
                         )
 
-                    state = transition_state
+    def batched_search(
+        self, text: Text, block_size: int = 1024
+    ) -> Generator[tuple[int, str]]:
+        """Search the text block by block, resolving the block entry states first.
+
+        The transition of every symbol is a vector mapping each state to its next
+        state. Composing the vectors of a block, by pairwise reduction, gives the
+        transition of the whole block, which yields the state at the start of every
+        block without any serial dependency inside the blocks. Each block is then
+        scanned independently from its entry state.
+
+        The composition costs one vector per symbol, so this only pays off when
+        the blocks are scanned in parallel or the automaton is small.
 
-                if self.dfa.is_accepting_state(state):
-                    pattern = self.pattern_map[state]
-                    yield (index - len(pattern) + 1), pattern
+        Args:
+            text (Text): The input text to search through, see :meth:`search`.
+            block_size (int): The number of symbols per block.
+
+        Yields:
+            tuple[int, str]: Same as :meth:`search`
+        """
+        if self.goto is None:
+            yield from self.search(text)
+            return
+        # The columns of the whole text, translated as by `search`
+        cols = b"".join(
+            cols
+            for _, cols in column_blocks(
+                self.dfa, self.col_table, text, SCAN_BLOCK_SIZE
+            )
+        )
+
+        # Transition vector of each symbol: the column of the flattened table
+        col_vectors = {col: self.goto[col :: self.width] for col in set(cols)}
+
+        # Entry state of every block
+        entry_states = [0]
+        for offset in range(0, len(cols) - block_size, block_size):
+            vectors = [col_vectors[col] for col in cols[offset : offset + block_size]]
+            while len(vectors) > 1:
+                vectors = [
+                    compose_transitions(vectors[i], vectors[i + 1])
+                    if i + 1 < len(vectors)
+                    else vectors[i]
+                    for i in range(0, len(vectors), 2)
+                ]
+            entry_states.append(vectors[0][entry_states[-1]])
+
+        out_pos, out_state = array("i"), array("i")
+        for block, state in enumerate(entry_states):
+            offset = block * block_size
+            scan(
+                self.goto,
+                self.width,
+                self.accept_mask,
+                cols[offset : offset + block_size],
+                state,
+                offset,
+                out_pos,
+                out_state,
+            )
+            for index, accepting in zip(out_pos, out_state):
+                yield (
+                    index - self.pattern_len[accepting] + 1,
+                    self.patterns_by_state[accepting],
+                )
+            del out_pos[:], out_state[:]
@@ -6,7 +6,8 @@ This module provides a DFA implementation with support for:
 - Accepting/non-accepting state classification
 - Breadth-first traversal capabilities
 - Complete alphabet validation
-- Serialization and deserialization to/from JSON
+- Serialization and deserialization to/from JSON, or a compact binary form
+- A flat row-major transition table for the lookups
 
 Classes:
     TransitionType: Enum for classifying transition types (success/failure)
@@ -16,13 +17,24 @@ Type Aliases:
     State: Integer representation of DFA states
 """
 
+import base64
+import json
+import struct
+import sys
+from array import array
 from enum import Enum
-from collections import deque
 from collections.abc import Generator
+from itertools import compress
 from typing import Any
+from strings._ac_kernel import OUT_OF_ALPHABET, column_table, string_column_table
 
 State = int
 
+# Header of the binary representation of a DFA: the magic bytes, and the size of the
+# JSON header holding the alphabets and the initial state
+_BINARY_MAGIC = b"TDFA"
+_BINARY_HEADER = struct.Struct("<4sI")
+
 
 class TransitionType(Enum):
     """Enumeration for types of transitions in the DFA"""
@@ -31,6 +43,11 @@ class TransitionType(Enum):
     FAILURE = "failure"  # Failure/fallback transition
 
 
+# The type of a transition by its flag in ``DFA.failure_mask``, the enum members are
+# only looked up when a type is returned
+_TRANSITION_TYPES = (TransitionType.SUCCESS, TransitionType.FAILURE)
+
+
 class DFA:
     """A Deterministic Finite Automaton (DFA) implementation.
 
@@ -46,6 +63,14 @@ class DFA:
     - Complete alphabet validation for transitions
 
     The states are represented as integers, starting from 0.
+
+    The transitions are also stored in a flat row-major table,
+    ``table[state * width + col]`` with -1 for a missing transition, their types in a
+    byte per entry of the table, ``failure_mask``, non-zero for the failure
+    transitions, and the accepting states in a byte per state, ``accept_mask``, from
+    which `accepting_states` is built. The lookups only use these flat tables. The
+    DFAs created by `from_table` only build the dictionaries of `transitions` from
+    the table when they are first accessed.
     """
 
     def __init__(self, alphabets: set[str]):
@@ -55,10 +80,26 @@ class DFA:
         """
         self.states: int | None = None  # The states are numbered from 0 to self.states
         self.alphabets: set[str] = alphabets
-        self.transitions: dict[State, dict[str, State]] = {}
-        self.transition_types: dict[State, dict[str, TransitionType]] = {}
+        # The sorted alphabets, the position of a symbol is its column
+        self.symbols: tuple[str, ...] = tuple(sorted(alphabets))
+        # The column of each symbol
+        self.col_of: dict[str, int] = {a: col for col, a in enumerate(self.symbols)}
+        self.width: int = len(self.symbols)
+        # Translation tables of the bytes and of the characters to the columns, see
+        # `strings._ac_kernel.column_table`, None when the columns do not fit in a
+        # byte
+        self.col_table: bytes | None = None
+        self.char_col_table: dict[int, int] | None = None
+        if self.width < OUT_OF_ALPHABET:
+            self.col_table = column_table(self.symbols)
+            self.char_col_table = string_column_table(self.symbols)
+        # Flat transition table, failure flags of the transitions, and accepting flags
+        self.table: array = array("i")
+        self.failure_mask: bytearray = bytearray()
+        self.accept_mask: bytearray = bytearray()
+        # The transitions by state and symbol, None until built from the table
+        self._transitions: dict[State, dict[str, State]] | None = {}
         self.initial_state: State | None = None
-        self.accepting_states: set[State] = set()
 
     def add_state(self, is_accepting: bool = False, is_initial: bool = False) -> State:
         """Add a new state to the DFA
@@ -78,14 +119,19 @@ class DFA:
             if self.initial_state:
                 raise ValueError("DFA already has an initial state")
             self.initial_state = self.states
-        if is_accepting:
-            self.accepting_states.add(self.states)
+        self.table.extend(array("i", [-1]) * self.width)
+        self.failure_mask.extend(bytes(self.width))
+        self.accept_mask.append(is_accepting)
 
         return self.states
 
     def bfs_traverse(self) -> Generator[tuple[State, str, State]]:
         """Performs a breadth-first traversal of the DFA starting from the initial state.
 
+        Each reachable state is expanded once, yielding all of its transitions except
+        the loops of the initial state on itself, and the states not seen yet are
+        queued for expansion.
+
         Yields:
             State: Parent state in BFS order
             str: The transition
@@ -97,25 +143,25 @@ class DFA:
         if self.initial_state is None:
             raise ValueError("DFA has no initial state")
 
-        first_level_children = [
-            (self.initial_state, chr, s)
-            for chr, s in list(self.transitions[self.initial_state].items())
-            if s != self.initial_state
-        ]
-        queue = deque(first_level_children)
-        visited = set(first_level_children)
+        width = self.width
+        # Each state is queued once, so the queue is a list of the states in BFS
+        # order, iterated while it grows, the iterator being the head of the queue
+        queue = [self.initial_state]
+        # One byte per state, like the accepting flags
+        visited = bytearray(self.n_states())
+        visited[self.initial_state] = 1
 
         # BFS traversal
-        while queue:
-            current_state = queue.popleft()
-            yield current_state
-
-            # Explore all transitions from current state
-            if current_state[2] in self.transitions:
-                for sym, next_state in self.transitions[current_state[2]].items():
-                    if (current_state[2], sym, next_state) not in visited:
-                        queue.append((current_state[2], sym, next_state))
-                        visited.add((current_state[2], sym, next_state))
+        for current_state in queue:
+            # Explore all transitions from current state, on its row of the table
+            row = current_state * width
+            for sym, next_state in zip(self.symbols, self.table[row : row + width]):
+                if next_state < 0 or current_state == next_state == self.initial_state:
+                    continue
+                yield current_state, sym, next_state
+                if not visited[next_state]:
+                    visited[next_state] = 1
+                    queue.append(next_state)
 
     def add_transition(
         self,
@@ -140,21 +186,97 @@ class DFA:
             raise ValueError(f"State {from_state} does not exist")
         if to_state < 0 or to_state > self.states:
             raise ValueError(f"State {to_state} does not exist")
-        if symbol not in self.alphabets:
+        # The column of the symbol tells whether it is in the alphabet
+        if (col := self.col_of.get(symbol)) is None:
             raise ValueError(f"Symbol {symbol} does not exist {self.alphabets}")
 
-        # Initialize the inner dictionaries if they don't exist
-        if from_state not in self.transitions:
-            self.transitions[from_state] = {}
-            self.transition_types[from_state] = {}
-
-        if symbol in self.transitions[from_state]:
+        # The flat table tells whether the transition is already defined
+        index = from_state * self.width + col
+        if self.table[index] >= 0:
             raise ValueError(
                 f"Transition from {from_state} on symbol {symbol} already exists"
             )
 
-        self.transitions[from_state][symbol] = to_state
-        self.transition_types[from_state][symbol] = transition_type
+        # Initialize the inner dictionary if it doesn't exist, unless the
+        # dictionaries are not built yet
+        if self._transitions is not None:
+            if (transitions := self._transitions.get(from_state)) is None:
+                transitions = self._transitions[from_state] = {}
+            transitions[symbol] = to_state
+        self.table[index] = to_state
+        self.failure_mask[index] = transition_type is TransitionType.FAILURE
+
+    def finalize(self) -> None:
+        """Rebuild the flat transition table and the accepting flags.
+
+        Only needed after `transitions` is assigned directly, or after `states` is
+        changed, `add_state` and `add_transition` keep the flat tables up to date. The
+        table is row-major, ``table[state * width + col]`` is the next state, or -1
+        when there is no such transition, where ``col`` is the column of the symbol in
+        `symbols`. The failure and accepting flags are kept, and the ones of new
+        entries are cleared.
+        """
+        width = self.width
+        size = self.n_states() * width
+        table = array("i", [-1]) * size
+        col_of = self.col_of
+        for state, transitions in self.transitions.items():
+            row = state * width
+            for symbol, to_state in transitions.items():
+                table[row + col_of[symbol]] = to_state
+        self.table = table
+        del self.failure_mask[size:]
+        self.failure_mask.extend(bytes(size - len(self.failure_mask)))
+        n_states = self.n_states()
+        del self.accept_mask[n_states:]
+        self.accept_mask.extend(bytes(n_states - len(self.accept_mask)))
+
+    @property
+    def accepting_states(self) -> set[State]:
+        """The accepting states, built from the accepting flags."""
+        return set(compress(range(len(self.accept_mask)), self.accept_mask))
+
+    @accepting_states.setter
+    def accepting_states(self, accepting_states: set[State]) -> None:
+        accept_mask = bytearray(self.n_states())
+        for state in accepting_states:
+            accept_mask[state] = 1
+        self.accept_mask = accept_mask
+
+    @property
+    def transitions(self) -> dict[State, dict[str, State]]:
+        """The transitions by state and symbol, built from the table when needed."""
+        if self._transitions is None:
+            width, symbols, table = self.width, self.symbols, self.table
+            transitions = {}
+            for state in range(self.n_states()):
+                row = table[state * width : (state + 1) * width]
+                if -1 not in row:
+                    transitions[state] = dict(zip(symbols, row))
+                elif row.count(-1) < width:
+                    transitions[state] = {
+                        a: to_state
+                        for a, to_state in zip(symbols, row)
+                        if to_state >= 0
+                    }
+            self._transitions = transitions
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, transitions: dict[State, dict[str, State]]) -> None:
+        self._transitions = transitions
+
+    @property
+    def transition_types(self) -> dict[State, dict[str, TransitionType]]:
+        """The type of each transition, rebuilt from the failure flags."""
+        width, col_of, failure_mask = self.width, self.col_of, self.failure_mask
+        return {
+            state: {
+                symbol: _TRANSITION_TYPES[failure_mask[state * width + col_of[symbol]]]
+                for symbol in transitions
+            }
+            for state, transitions in self.transitions.items()
+        }
 
     def add_accepting(self, state: State) -> None:
         """Adds a state as an accepting state.
@@ -167,7 +289,7 @@ class DFA:
             raise ValueError("No state defined")
         if state < 0 or state > self.states:
             raise ValueError(f"State {state} does not exist")
-        self.accepting_states.add(state)
+        self.accept_mask[state] = 1
 
     def set_accepting(self, state: State, accepting: bool) -> None:
         """Sets a state to be an accepting state.
@@ -175,10 +297,9 @@ class DFA:
             state (State): The state
             accepting(bool): Whether the state is an accepting state or not.
         """
-        if accepting:
-            self.accepting_states.add(state)
-        else:
-            self.accepting_states.remove(state)
+        if not accepting and not self.accept_mask[state]:
+            raise KeyError(state)
+        self.accept_mask[state] = accepting
 
     def get_transition_type(
         self, from_state: State, symbol: str
@@ -192,9 +313,13 @@ class DFA:
         Returns:
             Optional[TransitionType]: Transition type if transition exists, None otherwise
         """
-        if from_state not in self.transition_types:
+        # The type is read at the same index of the flat table as the transition
+        if (col := self.col_of.get(symbol)) is None:
             return None
-        return self.transition_types[from_state].get(symbol)
+        index = from_state * self.width + col
+        if self.table[index] < 0:
+            return None
+        return _TRANSITION_TYPES[self.failure_mask[index]]
 
     def is_accepting_state(self, state: State) -> bool:
         """Checks if a state is part of accepting state.
@@ -203,7 +328,7 @@ class DFA:
         """
         if self.states is None or state < 0 or state > self.states:
             raise ValueError(f"State {state} does not exist")
-        return state in self.accepting_states
+        return bool(self.accept_mask[state])
 
     def has_transition(self, current_state: State, symbol: str) -> bool:
         """Checks if there is a transition for a symbol at a given state.
@@ -225,9 +350,23 @@ class DFA:
         Returns:
             Optional[State]: Next state if transition exists, None otherwise
         """
-        if current_state not in self.transitions:
+        if (col := self.col_of.get(symbol)) is None:
             return None
-        return self.transitions[current_state].get(symbol)
+        to_state = self.table[current_state * self.width + col]
+        return None if to_state < 0 else to_state
+
+    def transition_by_col(self, current_state: State, col: int) -> State | None:
+        """Get the next state based on current state and the column of the input symbol.
+
+        Args:
+            current_state: Current state
+            col: Column of the input symbol in `symbols`
+
+        Returns:
+            Optional[State]: Next state if transition exists, None otherwise
+        """
+        to_state = self.table[current_state * self.width + col]
+        return None if to_state < 0 else to_state
 
     def n_states(self):
         """Gets number of states.
@@ -236,6 +375,44 @@ class DFA:
         """
         return self.states + 1 if self.states is not None else 0
 
+    @classmethod
+    def from_table(
+        cls,
+        alphabets: set[str],
+        table: array,
+        accepting_states: set[State],
+        initial_state: State = 0,
+        failure_mask: bytearray | None = None,
+    ) -> "DFA":
+        """Create a DFA from a prebuilt flat transition table.
+
+        The table is taken as is, without the checks of `add_transition` on each
+        transition. It must be row-major over the sorted alphabets,
+        ``table[state * width + col]``, with -1 for a missing transition, and hold
+        one row for every state.
+
+        Args:
+            alphabets: The alphabets of the DFA
+            table: Flat transition table
+            accepting_states: The accepting states
+            initial_state: The initial state
+            failure_mask: Non-zero for the failure transitions, one byte per entry of
+                the table. All the transitions are success transitions when None
+
+        Returns:
+            DFA: The DFA over the table
+        """
+        dfa = cls(alphabets)
+        n_states = len(table) // dfa.width
+        dfa.states = n_states - 1 if n_states else None
+        dfa.initial_state = initial_state
+        dfa.accepting_states = accepting_states
+        dfa.table = table
+        dfa.failure_mask = bytearray(len(table)) if failure_mask is None else failure_mask
+        # The dictionaries of the transitions are built from the table when needed
+        dfa._transitions = None
+        return dfa
+
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "DFA":
         """Create a DFA from a dictionary representation.
@@ -259,40 +436,112 @@ class DFA:
                 symbol: int(to_state) for symbol, to_state in transitions.items()
             }
 
-        # Restore transition types
-        for state_str, transitions in data["transition_types"].items():
-            state = int(state_str)
-            dfa.transition_types[state] = {
-                symbol: TransitionType(type_value)
-                for symbol, type_value in transitions.items()
-            }
-
         # Restore initial state
         dfa.initial_state = data["initial_state"]
 
         # Restore accepting states
         dfa.accepting_states = set(data["accepting_states"])
 
+        dfa.finalize()
+
+        # Restore transition types, from the failure flags as they are, or from the
+        # type of each transition of the older dictionaries, decoded once rather
+        # than by calling the enum for each transition
+        if "failure_mask" in data:
+            dfa.failure_mask[:] = base64.b64decode(data["failure_mask"])
+            return dfa
+        is_failure = {t.value: t is TransitionType.FAILURE for t in TransitionType}
+        col_of, failure_mask = dfa.col_of, dfa.failure_mask
+        for state_str, transitions in data["transition_types"].items():
+            row = int(state_str) * dfa.width
+            for symbol, type_value in transitions.items():
+                failure_mask[row + col_of[symbol]] = is_failure[type_value]
         return dfa
 
     def to_dict(self) -> dict[str, Any]:
         """Serialize the DFA to a dictionary that can be converted to JSON.
 
+        The alphabets and the accepting states are sorted, so the same DFA is always
+        serialized the same way.
+
         Returns:
             dict[str, Any]: Dictionary representation of the DFA
         """
-        # Convert transition_types to a serializable format
-        serializable_transition_types = {}
-        for state, transitions in self.transition_types.items():
-            serializable_transition_types[str(state)] = {
-                symbol: trans_type.value for symbol, trans_type in transitions.items()
-            }
-
         return {
             "states": self.states,
-            "alphabets": list(self.alphabets),
+            "alphabets": list(self.symbols),
             "transitions": {str(k): v for k, v in self.transitions.items()},
-            "transition_types": serializable_transition_types,
+            # The failure flags, one byte per entry of the table, base64 encoded
+            "failure_mask": base64.b64encode(self.failure_mask).decode("ascii"),
             "initial_state": self.initial_state,
-            "accepting_states": list(self.accepting_states),
+            "accepting_states": list(
+                compress(range(len(self.accept_mask)), self.accept_mask)
+            ),
         }
+
+    def to_bytes(self) -> bytes:
+        """Serialize the DFA to a compact binary representation.
+
+        The flat tables are written as they are, after a header holding the
+        alphabets and the initial state: the transition table as little-endian
+        32-bit ints, then the failure flags and the accepting flags, one byte each.
+
+        Returns:
+            bytes: Binary representation of the DFA
+        """
+        header = json.dumps(
+            {
+                "alphabets": list(self.symbols),
+                "initial_state": self.initial_state,
+                "states": self.n_states(),
+            }
+        ).encode("utf-8")
+        table = array("i", self.table)
+        if sys.byteorder == "big":
+            table.byteswap()
+        return b"".join(
+            (
+                _BINARY_HEADER.pack(_BINARY_MAGIC, len(header)),
+                header,
+                table.tobytes(),
+                self.failure_mask,
+                self.accept_mask,
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DFA":
+        """Create a DFA from its binary representation.
+
+        Args:
+            data: Binary representation of a DFA, see `to_bytes`
+
+        Returns:
+            DFA: Reconstructed DFA object
+
+        Raises:
+            ValueError: If the data is not the binary representation of a DFA
+        """
+        magic, header_size = _BINARY_HEADER.unpack_from(data)
+        if magic != _BINARY_MAGIC:
+            raise ValueError("Not a binary DFA")
+        offset = _BINARY_HEADER.size
+        header = json.loads(bytes(data[offset : offset + header_size]))
+        offset += header_size
+
+        n_states = header["states"]
+        size = n_states * len(header["alphabets"])
+        table = array("i")
+        table.frombytes(data[offset : offset + size * table.itemsize])
+        if sys.byteorder == "big":
+            table.byteswap()
+        offset += size * table.itemsize
+        failure_mask = bytearray(data[offset : offset + size])
+        accept_mask = data[offset + size : offset + size + n_states]
+        return cls.from_table(
+            set(header["alphabets"]),
+            table,
+            set(compress(range(n_states), accept_mask)),
+            initial_state=header["initial_state"],
+            failure_mask=failure_mask,
+        )
@@ -4,12 +4,25 @@ This module provides a KMPMatcher class that implements pattern matching using e
 precomputed state transitions or failure functions for memory/speed tradeoffs.
 """
 
+from array import array
 from collections.abc import Generator
 from strings.dfa import DFA, TransitionType
+from strings._ac_kernel import OUT_OF_ALPHABET, compile_scan
+from strings.utils import Text, column_blocks, decode_text
+
+# Number of bytes handed to the scanner at once
+SCAN_BLOCK_SIZE = 1 << 16
+
+# Longest pattern searched with bytes.find rather than the scanner
+FIND_MAX_LENGTH = 64
 
 
 def search_lazy_transition(
-    dfa: DFA, fail_functions: list[int], pattern: str, s: str
+    dfa: DFA,
+    fail_functions: list[int],
+    pattern: str,
+    s: Text,
+    col_table: bytes | None = None,
 ) -> Generator[tuple[int, str]]:
     """Searches for pattern matches in text using KMP algorithm.
 
@@ -23,49 +36,53 @@ def search_lazy_transition(
         dfa: The DFA representing the automaton for the success path search
         pattern: The pattern
         fail_functions: The fail functions that augment the DFA
+        col_table: Translation table from bytes to the columns of the DFA, see
+            `strings.utils.column_blocks`
 
     Yields:
         int: Starting positions of pattern matches in the text
         str: The pattern
 
+    Raises:
+        ValueError: If the text contains a symbol outside of the alphabet
+
     Example:
         >>> matcher = KMPMatcher("ABC", compute_transitions=True)
         >>> list(matcher.search("ABCABCABC"))
         [0, 3, 6]
     """
+    table, width, symbols = dfa.table, dfa.width, dfa.symbols
+    accept_mask = dfa.accept_mask
     state = 0
-    for index, sym in enumerate(s):
-        if (new_state := dfa.transition(state, sym)) is not None:
-            state = new_state
-        else:
-            fail_functions_index = (state - 1) if state > 0 else 0
-            transition_state: int = 0
-
-            # Follow fail functions or reach root
-            while (
-                not (
-                    transition_state := dfa.transition(
-                        fail_functions[fail_functions_index], sym
+    for offset, cols in column_blocks(dfa, col_table, s, SCAN_BLOCK_SIZE):
+        for index, col in enumerate(cols, offset):
+            if (new_state := table[state * width + col]) < 0:
+                # Follow fail functions until a state has a transition on the
+                # symbol, or reach root
+                chain = [state]
+                new_state = 0
+                while chain[-1] != 0:
+                    fail_state = fail_functions[chain[-1] - 1]
+                    if (found := table[fail_state * width + col]) >= 0:
+                        new_state = found
+                        break
+                    chain.append(fail_state)
+
+                # Cache the computed transition for future use, for the state and
+                # for the states visited on the way, which all lead to the same
+                # state on this symbol. They are known to be missing since their
+                # lookups failed
+                for missing in chain:
+                    dfa.add_transition(
+                        missing,
+                        symbol=symbols[col],
+                        to_state=new_state,
+                        transition_type=TransitionType.FAILURE,
                     )
-                    or 0
-                )
-                and fail_functions_index > 0
-            ):
-                fail_functions_index = fail_functions[fail_functions_index]
-
-            # Cache the computed transition for future use
-            if dfa.transition(state, sym) is None:
-                dfa.add_transition(
-                    state,
-                    symbol=sym,
-                    to_state=transition_state or 0,
-                    transition_type=TransitionType.FAILURE,
-                )
-
-            state = transition_state
+            state = new_state
 
-        if dfa.is_accepting_state(state):
-            yield index - state + 1, pattern
+            if accept_mask[state]:
+                yield index - state + 1, pattern
 
 
 class KMPMatcher:
@@ -80,6 +97,12 @@ class KMPMatcher:
         fail_functions (list[int]): Array storing failure function values. The index corresponds to the state - 1,
              because there is no fail_functions for 0th state.
         dfa (DFA): Deterministic finite automaton for pattern matching
+        col_table (bytes | None): Translation table from bytes to the columns of the
+            DFA, see `strings._ac_kernel.column_table`
+        _scan (Callable | None): Scanner specialized on the flat transition table of
+            the DFA by `finalize`, None when the search goes through the DFA
+        _pattern_cols (bytes | None): The columns of the symbols of the pattern,
+            set by `finalize` along with `_scan`
 
     Args:
         pattern (str): The pattern string to search for
@@ -101,15 +124,22 @@ class KMPMatcher:
           memory but may be slower for matching
     """
 
-    def _initialize_dfa(self, alphabets: set[str], pattern: str) -> DFA:
-        """Initializes KMP automaton for pattern matching.
+    def _build_dfa(
+        self, alphabets: set[str], pattern: str, fail_functions: list[int]
+    ) -> DFA:
+        """Builds the KMP automaton in a single pass over the pattern.
 
-        Creates and configures a DFA for KMP pattern matching with states
-        corresponding to pattern prefixes.
+        At each step, the state of the prefix gets its success transition, and the
+        fail function of the next state is computed. When the transitions are
+        precomputed, the row of the state is first copied from the row of its
+        failure state, which is complete since it is a shorter prefix, and the
+        fail function is read from that same row. Otherwise it is found by
+        following the fail functions. The flat table is then handed to the DFA.
 
         Args:
             alphabets: Set of valid input symbols
             pattern: Pattern string to search for
+            fail_functions: Receives the failure functions
 
         Returns:
             DFA: Configured automaton for pattern matching
@@ -117,31 +147,43 @@ class KMPMatcher:
         Raises:
             ValueError: If pattern contains characters not in alphabet
         """
-        dfa = DFA(alphabets=alphabets)
-        # Creates the states
-        dfa.add_state(is_accepting=(0 == len(pattern)), is_initial=True)
-        for index, sym in enumerate(pattern):
-            dfa.add_state(
-                is_accepting=(index == len(pattern) - 1), is_initial=index == 0
-            )
-            if index < len(pattern):
-                dfa.add_transition(
-                    from_state=index,
-                    to_state=index + 1,
-                    symbol=sym,
-                    transition_type=TransitionType.SUCCESS,
-                )
-        if self.compute_transitions:
-            # Initializes the state 0
-            for a in alphabets:
-                if not dfa.transition(0, a):
-                    dfa.add_transition(
-                        from_state=0,
-                        to_state=0,
-                        symbol=a,
-                        transition_type=TransitionType.FAILURE,
-                    )
-        return dfa
+        col_of = {a: col for col, a in enumerate(sorted(alphabets))}
+        try:
+            cols = [col_of[sym] for sym in pattern]
+        except KeyError as e:
+            raise ValueError(f"Symbol {e.args[0]} does not exist {alphabets}") from e
+        width = len(col_of)
+        precompute = self.compute_transitions
+
+        # All the transitions are failure ones, except the ones along the pattern
+        table = array("i", [0 if precompute else -1]) * ((len(cols) + 1) * width)
+        failure_mask = bytearray([precompute]) * len(table)
+        for index, col in enumerate(cols):
+            row = index * width
+            if index > 0:
+                fail_state = fail_functions[index - 1]
+                if precompute:
+                    fail_row = fail_state * width
+                    table[row : row + width] = table[fail_row : fail_row + width]
+                    fail_functions[index] = table[fail_row + col]
+                else:
+                    # Follow the fail functions until a state has a success
+                    # transition on the symbol
+                    while (
+                        to_state := table[fail_state * width + col]
+                    ) < 0 and fail_state > 0:
+                        fail_state = fail_functions[fail_state - 1]
+                    fail_functions[index] = max(to_state, 0)
+            table[row + col] = index + 1
+            failure_mask[row + col] = 0
+        if precompute:
+            # The accepting state only has failure transitions
+            fail_row = fail_functions[-1] * width
+            row = len(cols) * width
+            table[row : row + width] = table[fail_row : fail_row + width]
+        return DFA.from_table(
+            alphabets, table, {len(pattern)}, failure_mask=failure_mask
+        )
 
     def __init__(
         self, pattern: str, compute_transitions: bool, alphabets: str | None = None
@@ -152,29 +194,86 @@ class KMPMatcher:
 
         alphabet_set = set(alphabets) if alphabets else set(pattern)
 
-        dfa = self._initialize_dfa(alphabet_set, pattern)
-
         # define fail _functions and transitions
         fail_functions = [0] * len(pattern)
-        for index in range(1, len(pattern) + 1):
-            if compute_transitions:
-                # set the transitions
-                for a in alphabet_set:
-                    if not dfa.has_transition(index, a):
-                        to_state = dfa.transition(fail_functions[index - 1], a) or 0
-                        dfa.add_transition(
-                            index, a, to_state, transition_type=TransitionType.FAILURE
-                        )
-            # compute the next fail function
-            if index < len(pattern):
-                fail_functions[index] = (
-                    dfa.transition(fail_functions[index - 1], pattern[index]) or 0
-                )
+        dfa = self._build_dfa(alphabet_set, pattern, fail_functions)
         self.fail_functions = fail_functions
         self.dfa = dfa
         self.pattern = pattern
+        self.finalize()
+
+    def finalize(self) -> None:
+        """Prepare the lookup tables used by search.
+
+        When the alphabet has at most 254 symbols, so the columns fit in a byte, the
+        search runs over the text translated to columns.
+        When the transitions are also precomputed and complete, a scanner is
+        generated on the flat transition table of the DFA, and the pattern is
+        translated to columns so short patterns can be searched with ``bytes.find``.
+        """
+        self.col_table = None
+        self._scan = None
+        self._pattern_cols = None
+        symbols = self.dfa.symbols
+        if len(symbols) >= OUT_OF_ALPHABET:
+            return
+        self.col_table = self.dfa.col_table
+        if not self.compute_transitions or -1 in self.dfa.table:
+            return
+        self._scan = compile_scan(self.dfa.table, self.dfa.width, self.dfa.accept_mask)
+        col_of = self.dfa.col_of
+        self._pattern_cols = bytes(col_of[a] for a in self.pattern)
+
+    def _find_search(self, s: Text) -> Generator[tuple[int, str]]:
+        """Searches for the pattern in the columns of the text with ``bytes.find``.
+
+        The occurrences of the pattern are found in C rather than by following the
+        DFA symbol by symbol. The last symbols of each block are kept in front of
+        the next one, so the occurrences across blocks are found too.
 
-    def search(self, s: str) -> Generator[tuple[int, str]]:
+        Args:
+            s: Input text to search in
+
+        Yields:
+            Tuple of:
+                - int: Starting positions of pattern matches in the text
+                - str: The pattern
+        """
+        pattern_cols, pattern = self._pattern_cols, self.pattern
+        overlap = len(pattern_cols) - 1
+        tail = b""
+        for offset, cols in column_blocks(self.dfa, self.col_table, s, SCAN_BLOCK_SIZE):
+            if tail:
+                cols = tail + cols
+                offset -= len(tail)
+            find = cols.find
+            index = find(pattern_cols)
+            while index >= 0:
+                yield offset + index, pattern
+                index = find(pattern_cols, index + 1)
+            if overlap:
+                tail = cols[-overlap:]
+
+    def __getstate__(self) -> dict:
+        """Drop the generated scanner, which cannot be pickled.
+
+        Returns:
+            dict: The attributes of the matcher without `_scan`
+        """
+        state = self.__dict__.copy()
+        state["_scan"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore the attributes and regenerate the scanner.
+
+        Args:
+            state (dict): The attributes returned by `__getstate__`
+        """
+        self.__dict__.update(state)
+        self.finalize()
+
+    def search(self, s: Text) -> Generator[tuple[int, str]]:
         """Searches for pattern matches in text using KMP algorithm.
 
         Implements KMP pattern matching algorithm to find all occurrences of the pattern
@@ -182,7 +281,7 @@ class KMPMatcher:
         based on initialization.
 
         Args:
-            s: Input text to search in
+            s: Input text to search in, buffers are searched one byte per symbol
 
         Yields:
             Tuple of:
@@ -195,16 +294,33 @@ class KMPMatcher:
             [0, 3, 6]
         """
         state = 0
-        if self.compute_transitions:
-            for index, sym in enumerate(s):
+        if self._scan is not None and len(self.pattern) <= FIND_MAX_LENGTH:
+            yield from self._find_search(s)
+        elif self._scan is not None:
+            # Flat transitions: the text is encoded once, and each block is
+            # translated to columns before the scanner runs over it
+            out_pos, out_state = array("i"), array("i")
+            for offset, cols in column_blocks(self.dfa, self.col_table, s, SCAN_BLOCK_SIZE):
+                state = self._scan(cols, state, offset, out_pos, out_state)
+                for index, accepting in zip(out_pos, out_state):
+                    # The accepting state is the length of the pattern
+                    yield index - accepting + 1, self.pattern
+                del out_pos[:], out_state[:]
+        elif self.compute_transitions:
+            # The columns do not fit in a byte, look up the flat transition
+            # table of the DFA directly
+            table, width, col_of = self.dfa.table, self.dfa.width, self.dfa.col_of
+            accept_mask = self.dfa.accept_mask
+            for index, sym in enumerate(decode_text(s)):
                 # Update state based on current character
-                if (new_state := self.dfa.transition(state, sym)) is None:
+                if (col := col_of.get(sym)) is None or (
+                    state := table[state * width + col]
+                ) < 0:
                     raise ValueError("Error in DFA definition")
-                state = new_state
                 # Found a match
-                if self.dfa.is_accepting_state(state):
+                if accept_mask[state]:
                     yield index - state + 1, self.pattern
         else:
             yield from search_lazy_transition(
-                self.dfa, self.fail_functions, self.pattern, s
+                self.dfa, self.fail_functions, self.pattern, s, self.col_table
             )
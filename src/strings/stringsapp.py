@@ -8,27 +8,283 @@ The functions in this module are designed to be used by command-line
 applications for pattern matching tasks.
 """
 
+import base64
+import functools
+import hashlib
 import json
+import mmap
+import os
+import pickle
+import struct
 import sys
+import tempfile
+from collections.abc import Iterator
 from strings.kmp import KMPMatcher
 from strings.ahocorasick import AhoCorasickMatcher
 from strings.dfa import DFA
+from strings.utils import Text
 
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
 
-def read_input(file_path: str | None = None) -> str:
+
+# Number of matchers loaded from DFA files kept for the next loads
+LOADED_MATCHERS_CACHE_SIZE = 32
+
+# Version of the layout of the cached matchers, to be increased whenever the
+# attributes of the matchers change, so the matchers cached by other versions are
+# built again rather than loaded
+MATCHER_CACHE_VERSION = 3
+
+# Errors of the cached matchers which cannot be loaded, which are built again
+_CACHE_LOAD_ERRORS = (
+    pickle.UnpicklingError,
+    EOFError,
+    AttributeError,
+    ImportError,
+    IndexError,
+    TypeError,
+    ValueError,
+)
+
+# Formats of the DFA files: JSON, or the binary form of the DFA after a header
+DFA_FILE_FORMATS = ("json", "binary")
+
+# Header of the binary DFA files: the magic bytes, and the size of the JSON object
+# holding the other data of the file, written before the binary form of the DFA
+_BINARY_FILE_MAGIC = b"TDFM"
+_BINARY_FILE_HEADER = struct.Struct("<4sI")
+
+
+def dumps_json(data: dict) -> bytes:
+    """Encode the data of a DFA file as compact JSON.
+
+    The JSON is encoded by orjson when it is installed, which is several times
+    faster on the large lists of the files, and otherwise at once by the C encoder
+    of `json`, which `json.dump` does not use as it streams. Either way it is
+    written without indentation or spaces after the separators.
+
+    Args:
+        data: The data to encode
+
+    Returns:
+        bytes: The UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(content: bytes) -> dict:
+    """Decode the JSON data of a DFA file, with orjson when it is installed.
+
+    Args:
+        content: The UTF-8 encoded JSON
+
+    Returns:
+        dict: The decoded data
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def read_input(file_path: str | None = None) -> Text:
     """Read input text from file or stdin.
 
+    Files are memory-mapped rather than read, so the text is paged in by the OS
+    and the matchers scan its bytes without copying or decoding them. Stdin is
+    read as bytes. The text is UTF-8, which `decode_input` decodes when the
+    alphabet of the matcher is not ASCII.
+
     Args:
         file_path: Path to input file, or None to read from stdin
 
     Returns:
-        str: Input text
+        Text: Input text, one byte per symbol
     """
     if file_path:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+        with open(file_path, "rb") as f:
+            # An empty file cannot be mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        return sys.stdin.buffer.read()
+
+
+def decode_input(
+    text: Text, matcher: KMPMatcher | AhoCorasickMatcher
+) -> Text:
+    """Decode an input buffer as UTF-8, unless the alphabet of the matcher is ASCII.
+
+    The bytes of a UTF-8 text are its characters only when they are ASCII, the
+    other characters are encoded on several bytes. An ASCII alphabet is searched
+    over the bytes as they are, the characters outside of it are rejected either
+    way.
+
+    Args:
+        text: Input text, a buffer from `read_input` or a string
+        matcher: The matcher to search the text with
+
+    Returns:
+        Text: The text as is, or decoded to a string
+    """
+    if isinstance(text, str) or "".join(matcher.dfa.symbols).isascii():
+        return text
+    return str(text, "utf-8")
+
+
+def encode_dfa(dfa: DFA) -> str:
+    """Encode a DFA for a DFA file.
+
+    The binary form of the DFA is stored base64 encoded, so loading it does not
+    parse a JSON object per state, while the other fields of the file stay
+    readable.
+
+    Args:
+        dfa: The DFA to encode
+
+    Returns:
+        str: The base64 encoded binary form of the DFA
+    """
+    return base64.b64encode(dfa.to_bytes()).decode("ascii")
+
+
+def decode_dfa(data: dict) -> DFA:
+    """Decode the DFA of a DFA file.
+
+    Args:
+        data: The content of the DFA file, holding either the binary form of the
+            DFA, or its dictionary representation
+
+    Returns:
+        DFA: The DFA
+    """
+    if "dfa_binary" in data:
+        return DFA.from_bytes(base64.b64decode(data["dfa_binary"]))
+    return DFA.from_dict(data["dfa"])
+
+
+def encode_pattern_map(patterns: list[str], pattern_map: dict[int, str]) -> list[int]:
+    """Encode the pattern map of an Aho-Corasick matcher for a DFA file.
+
+    The patterns are already in the file, so only the accepting state of each
+    pattern is stored, in the same order, rather than a JSON object keyed by the
+    states as strings.
+
+    Args:
+        patterns: The patterns of the matcher
+        pattern_map: The pattern of each accepting state
+
+    Returns:
+        list[int]: The accepting state of each pattern
+    """
+    state_of = {pattern: state for state, pattern in pattern_map.items()}
+    return [state_of[pattern] for pattern in patterns]
+
+
+def decode_pattern_map(data: dict) -> dict[int, str]:
+    """Decode the pattern map of a DFA file.
+
+    Args:
+        data: The content of the DFA file, holding either the accepting state of
+            each pattern, or the pattern map by state
+
+    Returns:
+        dict[int, str]: The pattern of each accepting state
+    """
+    if "pattern_states" in data:
+        return dict(zip(data["pattern_states"], data["patterns"]))
+    return {int(k): v for k, v in data["pattern_map"].items()}
+
+
+def write_dfa_file(
+    data: dict, dfa: DFA, output_file: str, file_format: str = "json"
+) -> None:
+    """Write a DFA and its additional data to a file.
+
+    In JSON, the JSON is encoded at once and written compact, see `dumps_json`,
+    which keeps the files of large transition tables small. In the binary format,
+    the additional data is written as JSON after a header, followed by the binary
+    form of the DFA as is, without the base64 encoding.
+
+    Args:
+        data: The additional data of the DFA
+        dfa: The DFA
+        output_file: Path to save the DFA to
+        file_format: Format of the file, one of `DFA_FILE_FORMATS`
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if file_format == "json":
+        data = {**data, "dfa_binary": encode_dfa(dfa)}
+        with open(output_file, "wb") as f:
+            f.write(dumps_json(data))
+    elif file_format == "binary":
+        header = dumps_json(data)
+        with open(output_file, "wb") as f:
+            f.write(_BINARY_FILE_HEADER.pack(_BINARY_FILE_MAGIC, len(header)))
+            f.write(header)
+            f.write(dfa.to_bytes())
+    else:
+        raise ValueError(f"Unknown DFA file format {file_format}")
+
+
+def read_dfa_file(file_path: str) -> tuple[dict, DFA]:
+    """Read a DFA and its additional data from a file.
+
+    The format is told by the first bytes of the file, see `write_dfa_file`.
+
+    Args:
+        file_path: Path to the DFA file
+
+    Returns:
+        dict: The additional data of the DFA
+        DFA: The DFA
+    """
+    with open(file_path, "rb") as f:
+        content = f.read()
+    if content.startswith(_BINARY_FILE_MAGIC):
+        _, header_size = _BINARY_FILE_HEADER.unpack_from(content)
+        offset = _BINARY_FILE_HEADER.size + header_size
+        data = loads_json(content[_BINARY_FILE_HEADER.size : offset])
+        return data, DFA.from_bytes(memoryview(content)[offset:])
+    data = loads_json(content)
+    return data, decode_dfa(data)
+
+
+def save_matcher(
+    matcher: KMPMatcher | AhoCorasickMatcher,
+    patterns: list[str],
+    output_file: str,
+    file_format: str = "json",
+) -> None:
+    """Save the DFA of a matcher and its additional data to a file.
+
+    Args:
+        matcher: The matcher to save
+        patterns: List of patterns the matcher was built from
+        output_file: Path to save the DFA to
+        file_format: Format of the file, one of `DFA_FILE_FORMATS`
+    """
+    if isinstance(matcher, KMPMatcher):
+        data = {
+            "algorithm": "kmp",
+            "pattern": matcher.pattern,
+            "fail_functions": matcher.fail_functions,
+        }
     else:
-        return sys.stdin.read()
+        data = {
+            "algorithm": "aho-corasick",
+            "patterns": patterns,
+            "fail_functions": matcher.fail_functions,
+            "pattern_states": encode_pattern_map(patterns, matcher.pattern_map),
+        }
+    write_dfa_file(data, matcher.dfa, output_file, file_format)
 
 
 def build_dfa(
@@ -37,15 +293,23 @@ def build_dfa(
     algorithm: str = "aho-corasick",
     precompute: bool = True,
     alphabet: str | None = None,
-) -> None:
+    file_format: str = "json",
+) -> KMPMatcher | AhoCorasickMatcher:
     """Build a DFA from patterns and save it to a file.
 
+    The matcher is returned as well, so it can be searched right away without
+    loading the file back.
+
     Args:
         patterns: List of patterns to build the DFA from
         output_file: Path to save the DFA to
         algorithm: Algorithm to use ('kmp' or 'aho-corasick')
         precompute: Whether to precompute transitions
         alphabet: Optional alphabet specification
+        file_format: Format of the file, one of `DFA_FILE_FORMATS`
+
+    Returns:
+        The matcher of the DFA (KMPMatcher or AhoCorasickMatcher)
     """
     if algorithm == "kmp":
         if len(patterns) > 1:
@@ -53,49 +317,69 @@ def build_dfa(
                 "Warning: KMP only supports a single pattern. Using the first pattern."
             )
 
-        # Create the matcher
-        kmp_matcher = KMPMatcher(
-            pattern=patterns[0], compute_transitions=precompute, alphabets=alphabet
-        )
+        kmp_matcher = build_matcher(patterns[:1], "kmp", precompute, alphabet)
+        save_matcher(kmp_matcher, patterns[:1], output_file, file_format)
 
-        # Save the DFA and additional data
-        data = {
-            "algorithm": "kmp",
-            "pattern": patterns[0],
-            "dfa": kmp_matcher.dfa.to_dict(),
-            "fail_functions": kmp_matcher.fail_functions,
-        }
+        print(f"KMP DFA for pattern '{patterns[0]}' saved to {output_file}")
+        return kmp_matcher
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+    # aho-corasick
+    ac_matcher = build_matcher(patterns, algorithm, precompute, alphabet)
+    save_matcher(ac_matcher, patterns, output_file, file_format)
 
-        print(f"KMP DFA for pattern '{patterns[0]}' saved to {output_file}")
+    print(f"Aho-Corasick DFA for {len(patterns)} patterns saved to {output_file}")
+    return ac_matcher
 
-    else:  # aho-corasick
-        # Create the matcher
-        ac_matcher = AhoCorasickMatcher(
-            patterns=patterns, compute_transitions=precompute, alphabets=alphabet
-        )
 
-        # Save the DFA and additional data
-        data = {
-            "algorithm": "aho-corasick",
-            "patterns": patterns,
-            "dfa": ac_matcher.dfa.to_dict(),
-            "fail_functions": ac_matcher.fail_functions,
-            "pattern_map": {str(k): v for k, v in ac_matcher.pattern_map.items()},
-        }
+def load_matcher_from_file(
+    file_path: str, precompute: bool = True
+) -> KMPMatcher | AhoCorasickMatcher:
+    """Load a matcher from a saved DFA file.
+
+    The loaded matchers are shared: loading the same file again returns the matcher
+    loaded the first time, unless the file was modified. The last
+    `LOADED_MATCHERS_CACHE_SIZE` matchers are kept, see `invalidate_loaded_matchers`.
+
+    Args:
+        file_path: Path to the DFA file
+        precompute: Whether to use precomputed transitions
+
+    Returns:
+        A matcher object (KMPMatcher or AhoCorasickMatcher)
+    """
+    stat = os.stat(file_path)
+    return _load_matcher(
+        os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, precompute
+    )
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
 
-        print(f"Aho-Corasick DFA for {len(patterns)} patterns saved to {output_file}")
+@functools.lru_cache(maxsize=LOADED_MATCHERS_CACHE_SIZE)
+def _load_matcher(  # pylint: disable=unused-argument
+    file_path: str, mtime_ns: int, size: int, precompute: bool
+) -> KMPMatcher | AhoCorasickMatcher:
+    """Read a matcher from a DFA file, once per version of the file.
 
+    Args:
+        file_path: Absolute path to the DFA file
+        mtime_ns: Modification time of the file, part of the cache key
+        size: Size of the file, part of the cache key
+        precompute: Whether to use precomputed transitions
 
-def load_matcher_from_file(
+    Returns:
+        A matcher object (KMPMatcher or AhoCorasickMatcher)
+    """
+    return read_matcher_file(file_path, precompute)
+
+
+def invalidate_loaded_matchers() -> None:
+    """Forget the matchers loaded from DFA files, the next loads read the files."""
+    _load_matcher.cache_clear()
+
+
+def read_matcher_file(
     file_path: str, precompute: bool = True
 ) -> KMPMatcher | AhoCorasickMatcher:
-    """Load a matcher from a saved DFA file.
+    """Read a matcher from a saved DFA file.
 
     Args:
         file_path: Path to the DFA file
@@ -104,34 +388,34 @@ def load_matcher_from_file(
     Returns:
         A matcher object (KMPMatcher or AhoCorasickMatcher)
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data, dfa = read_dfa_file(file_path)
 
     algorithm = data.get("algorithm")
 
     if algorithm == "kmp":
         # Create a KMP matcher
         kmp_matcher = KMPMatcher.__new__(KMPMatcher)
-        kmp_matcher.dfa = DFA.from_dict(data["dfa"])
+        kmp_matcher.dfa = dfa
         kmp_matcher.compute_transitions = precompute
         kmp_matcher.fail_functions = data["fail_functions"]
+        kmp_matcher.pattern = data["pattern"]
+        kmp_matcher.finalize()
 
         return kmp_matcher
 
     if algorithm == "aho-corasick":
         # Create an Aho-Corasick matcher
         ac_matcher = AhoCorasickMatcher.__new__(AhoCorasickMatcher)
-        ac_matcher.dfa = DFA.from_dict(data["dfa"])
+        ac_matcher.dfa = dfa
         ac_matcher.compute_transitions = precompute
         ac_matcher.fail_functions = data["fail_functions"]
-        ac_matcher.pattern_map = {int(k): v for k, v in data["pattern_map"].items()}
+        ac_matcher.pattern_map = decode_pattern_map(data)
+        ac_matcher.finalize()
 
         return ac_matcher
 
-    dfa = DFA.from_dict(data["dfa"])
-
     # Try to guess the algorithm based on the DFA structure
-    if "pattern_map" in data:
+    if "pattern_states" in data or "pattern_map" in data:
         # This is likely Aho-Corasick
         ac_matcher = AhoCorasickMatcher.__new__(AhoCorasickMatcher)
         ac_matcher.dfa = dfa
@@ -139,37 +423,134 @@ def load_matcher_from_file(
         ac_matcher.fail_functions = data.get(
             "fail_functions", [0] * (dfa.n_states() - 1)
         )
-        ac_matcher.pattern_map = {int(k): v for k, v in data["pattern_map"].items()}
+        ac_matcher.pattern_map = decode_pattern_map(data)
+        ac_matcher.finalize()
         return ac_matcher
     # This is likely KMP
     kmp_matcher = KMPMatcher.__new__(KMPMatcher)
     kmp_matcher.dfa = dfa
     kmp_matcher.compute_transitions = precompute
     kmp_matcher.fail_functions = data.get("fail_functions", [0] * (dfa.n_states() - 1))
+    kmp_matcher.pattern = data.get("pattern")
+    kmp_matcher.finalize()
     return kmp_matcher
 
 
+def matcher_cache_path(
+    cache_dir: str,
+    patterns: list[str],
+    algorithm: str,
+    precompute: bool,
+    alphabet: str | None,
+) -> str:
+    """Get the path of the cached matcher built with the given options.
+
+    Args:
+        cache_dir: Directory holding the cached matchers
+        patterns: List of patterns the matcher is built from
+        algorithm: Algorithm to use ('kmp' or 'aho-corasick')
+        precompute: Whether to precompute transitions
+        alphabet: Optional alphabet specification
+
+    Returns:
+        str: Path of the cache file, named after a hash of the options and of
+            `MATCHER_CACHE_VERSION`
+    """
+    key = json.dumps(
+        [MATCHER_CACHE_VERSION, algorithm, precompute, alphabet, patterns]
+    )
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.pkl")
+
+
+def build_matcher(
+    patterns: list[str],
+    algorithm: str = "aho-corasick",
+    precompute: bool = True,
+    alphabet: str | None = None,
+    cache_dir: str | None = None,
+) -> KMPMatcher | AhoCorasickMatcher:
+    """Build a matcher, or load it from the cache when it was already built.
+
+    The cache files hold `MATCHER_CACHE_VERSION` along with the matcher. The files
+    which cannot be loaded, or were written by another version, are cache misses:
+    the matcher is built again and the file overwritten.
+
+    Args:
+        patterns: List of patterns to search for
+        algorithm: Algorithm to use ('kmp' or 'aho-corasick')
+        precompute: Whether to precompute transitions
+        alphabet: Optional alphabet specification
+        cache_dir: Directory to cache the built matchers in, None to always build
+
+    Returns:
+        A matcher object (KMPMatcher or AhoCorasickMatcher)
+    """
+    cache_file = None
+    if cache_dir:
+        cache_file = matcher_cache_path(
+            cache_dir, patterns, algorithm, precompute, alphabet
+        )
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "rb") as f:
+                    version, matcher = pickle.load(f)
+            except _CACHE_LOAD_ERRORS:
+                version = None
+            if version == MATCHER_CACHE_VERSION:
+                return matcher
+
+    if algorithm == "kmp":
+        matcher = KMPMatcher(
+            pattern=patterns[0], compute_transitions=precompute, alphabets=alphabet
+        )
+    else:
+        matcher = AhoCorasickMatcher(
+            patterns=patterns, compute_transitions=precompute, alphabets=alphabet
+        )
+
+    if cache_file:
+        # Write to a temporary file first, so that a concurrent run never loads
+        # a partially written cache file
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as f:
+            pickle.dump(
+                (MATCHER_CACHE_VERSION, matcher), f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(f.name, cache_file)
+    return matcher
+
+
 def search_with_patterns(
-    text: str,
+    text: Text,
     patterns: list[str],
     algorithm: str = "aho-corasick",
     precompute: bool = True,
     alphabet: str | None = None,
     save_dfa: str | None = None,
-) -> list[tuple[int, str]]:
+    cache_dir: str | None = None,
+) -> Iterator[tuple[int, str]]:
     """Search for patterns in text using the specified algorithm.
 
     Args:
-        text: Input text to search in
+        text: Input text to search in, buffers are decoded by `decode_input`
         patterns: List of patterns to search for
         algorithm: Algorithm to use ('kmp' or 'aho-corasick')
         precompute: Whether to precompute transitions
         alphabet: Optional alphabet specification
         save_dfa: Path to save the DFA to a JSON file
+        cache_dir: Directory to cache the built matchers in, None to always build
 
     Returns:
-        List of matches (positions for KMP, (position, pattern) tuples for Aho-Corasick)
+        Iterator over the (position, pattern) matches, found lazily as it is consumed
     """
+    # A single pattern with precomputed transitions is searched by KMP, which
+    # finds patterns of up to `strings.kmp.FIND_MAX_LENGTH` symbols with
+    # ``bytes.find`` and the longer ones with its scanner, both faster than the
+    # Aho-Corasick scanner
+    if algorithm == "aho-corasick" and len(patterns) == 1 and precompute:
+        algorithm = "kmp"
+
     if algorithm == "kmp":
         if len(patterns) > 1:
             print(
@@ -177,69 +558,50 @@ def search_with_patterns(
             )
 
         # Create new matcher
-        kmp_matcher = KMPMatcher(
-            pattern=patterns[0], compute_transitions=precompute, alphabets=alphabet
+        kmp_matcher = build_matcher(
+            patterns[:1], "kmp", precompute, alphabet, cache_dir
         )
 
         # Save DFA if requested
         if save_dfa:
-            data = {
-                "algorithm": "kmp",
-                "pattern": patterns[0],
-                "dfa": kmp_matcher.dfa.to_dict(),
-                "fail_functions": kmp_matcher.fail_functions,
-            }
-
-            with open(save_dfa, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            save_matcher(kmp_matcher, patterns[:1], save_dfa)
 
             print(f"Saved KMP DFA to {save_dfa}")
 
-        return list(kmp_matcher.search(text))
+        return kmp_matcher.search(decode_input(text, kmp_matcher))
 
     # else: AC
     # Create new matcher
-    ac_matcher = AhoCorasickMatcher(
-        patterns=patterns, compute_transitions=precompute, alphabets=alphabet
-    )
+    ac_matcher = build_matcher(patterns, algorithm, precompute, alphabet, cache_dir)
 
     # Save DFA if requested
     if save_dfa:
-        data = {
-            "algorithm": "aho-corasick",
-            "patterns": patterns,
-            "dfa": ac_matcher.dfa.to_dict(),
-            "fail_functions": ac_matcher.fail_functions,
-            "pattern_map": {str(k): v for k, v in ac_matcher.pattern_map.items()},
-        }
-
-        with open(save_dfa, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        save_matcher(ac_matcher, patterns, save_dfa)
 
         print(f"Saved Aho-Corasick DFA to {save_dfa}")
 
     # Perform the Aho-Corasick search
-    return list(ac_matcher.search(text))
+    return ac_matcher.search(decode_input(text, ac_matcher))
 
 
 def search_with_dfa(
-    text: str,
+    text: Text,
     dfa_file: str,
     precompute: bool = True,
-) -> list[tuple[int, str]]:
+) -> Iterator[tuple[int, str]]:
     """Search for patterns in text using a pre-built DFA.
 
     Args:
-        text: Input text to search in
+        text: Input text to search in, buffers are decoded by `decode_input`
         dfa_file: Path to the DFA file
         precompute: Whether to use precomputed transitions
 
     Returns:
-        List of matches (positions for KMP, (position, pattern) tuples for Aho-Corasick)
+        Iterator over the (position, pattern) matches, found lazily as it is consumed
     """
     # Load matcher from file
     matcher = load_matcher_from_file(dfa_file, precompute)
     print(f"Loaded DFA from {dfa_file}")
 
     # Perform the search
-    return list(matcher.search(text))
+    return matcher.search(decode_input(text, matcher))
@@ -4,7 +4,104 @@ This module provides common utility functions used by different pattern matching
 algorithms like KMP and Aho-Corasick.
 """
 
+from collections.abc import Generator, Sequence
 from strings.dfa import DFA, TransitionType
+from strings._ac_kernel import OUT_OF_ALPHABET
+
+# Text to search: a string, or a buffer holding one byte per symbol
+Text = str | bytes | bytearray | memoryview
+
+
+def encode_text(text: Text) -> memoryview:
+    """Get a byte view of a text, one byte per symbol.
+
+    Strings are encoded to latin-1 so the byte offsets are the character offsets,
+    buffers such as bytes or memory-mapped files are used as they are.
+
+    Args:
+        text: The text to encode
+
+    Returns:
+        memoryview: The bytes of the text
+
+    Raises:
+        ValueError: If a character of the text does not fit in a byte
+    """
+    if isinstance(text, str):
+        try:
+            text = text.encode("latin-1")
+        except UnicodeEncodeError as e:
+            raise ValueError("Error in DFA definition") from e
+    return memoryview(text)
+
+
+def decode_text(text: Text) -> str:
+    """Get a text as a string, buffers are decoded one byte per character.
+
+    Args:
+        text: The text to decode
+
+    Returns:
+        str: The text
+    """
+    return text if isinstance(text, str) else str(text, "latin-1")
+
+
+def column_blocks(
+    dfa: DFA, col_table: bytes | None, text: Text, block_size: int
+) -> Generator[tuple[int, Sequence[int]]]:
+    """Translates a text to the columns of its symbols in the DFA, block by block.
+
+    When the alphabet has less than 255 symbols, the text is encoded once and each
+    block is translated by `col_table` in a single `bytes.translate` call, so no
+    string is created per symbol. Strings holding characters beyond latin-1 are
+    translated block by block with `str.translate` instead, and encoded to the same
+    columns. Otherwise the symbols are looked up in the columns of the DFA.
+
+    Args:
+        dfa: The DFA giving the columns of the symbols
+        col_table: Translation table from bytes to columns, see
+            `strings._ac_kernel.column_table`, None when the alphabet has 255
+            symbols or more
+        text: Input text
+        block_size: Number of symbols per block
+
+    Yields:
+        int: Offset of the block in the text
+        Sequence[int]: The columns of the symbols of the block
+
+    Raises:
+        ValueError: If the text contains a symbol outside of the alphabet
+    """
+    if col_table is None:
+        text = decode_text(text)
+        col_of = dfa.col_of
+        for offset in range(0, len(text), block_size):
+            cols = list(map(col_of.get, text[offset : offset + block_size]))
+            if None in cols:
+                raise ValueError("Error in DFA definition")
+            yield offset, cols
+        return
+    try:
+        view = encode_text(text)
+    except ValueError:
+        view = None
+    if view is None:
+        # The string holds characters beyond latin-1
+        table = dfa.char_col_table
+        for offset in range(0, len(text), block_size):
+            cols = text[offset : offset + block_size].translate(table)
+            cols = cols.encode("latin-1")
+            if OUT_OF_ALPHABET in cols:
+                raise ValueError("Error in DFA definition")
+            yield offset, cols
+        return
+    for offset in range(0, len(view), block_size):
+        cols = bytes(view[offset : offset + block_size]).translate(col_table)
+        if OUT_OF_ALPHABET in cols:
+            raise ValueError("Error in DFA definition")
+        yield offset, cols
+
 
 def compute_state_transitions(
     dfa: DFA, state_index: int, alphabets: str, fail_function_value: int
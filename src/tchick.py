@@ -45,19 +45,29 @@ Examples:
 
 Performance considerations:
 - Aho-Corasick is for multiple patterns
-- KMP is optimized for single pattern searches
+- KMP only supports a single pattern, and is the fastest for it with precomputed
+  transitions, so a single pattern is always searched with KMP in that case
 - Precomputed transitions (default) use more memory but are faster
 - Saved DFAs can be reused to avoid rebuilding the automaton
 """
 import argparse
+import os
 import sys
+import tempfile
+from collections.abc import Iterable
+from typing import TextIO
 
 from strings.stringsapp import (
+    DFA_FILE_FORMATS,
     read_input,
     build_dfa,
     search_with_patterns,
     search_with_dfa,
 )
+from strings.utils import Text
+
+# Number of characters of output buffered before writing them out
+OUTPUT_FLUSH_SIZE = 1 << 16
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -104,6 +114,13 @@ def parse_arguments() -> argparse.Namespace:
     strbuild_parser.add_argument(
         "--alphabet", help="Explicitly specify the alphabet characters"
     )
+    strbuild_parser.add_argument(
+        "--format",
+        choices=DFA_FILE_FORMATS,
+        default="json",
+        help="Format of the DFA file, binary files are smaller and faster to load "
+        "(default: json)",
+    )
 
     # Search command for string patterns
     strsearch_parser = subparsers.add_parser(
@@ -148,6 +165,11 @@ def parse_arguments() -> argparse.Namespace:
         "--save-dfa",
         help="Save the DFA to a JSON file (only when using --patterns or --patterns-file)",
     )
+    strsearch_parser.add_argument(
+        "--cache-dir",
+        help="Cache the DFAs built from patterns in this directory, and reuse them "
+        "on later runs with the same patterns and options",
+    )
     strsearch_parser.add_argument(
         "--output-format",
         choices=["csv", "text"],
@@ -160,25 +182,25 @@ def parse_arguments() -> argparse.Namespace:
 
     return parser.parse_args()
 
-def get_input_text(args: argparse.Namespace) -> str:
+def get_input_text(args: argparse.Namespace) -> Text:
     """Get the input text from file, command line argument, or stdin.
-    
+
+    Files are memory-mapped and stdin is read as bytes by `read_input`, the
+    matchers scan them one byte per symbol when the alphabet is ASCII, otherwise
+    the UTF-8 text is decoded before the search, see
+    `strings.stringsapp.decode_input`.
+
     Args:
         args: Command line arguments
         
     Returns:
-        str: The input text to search in
+        Text: The input text to search in
     """
     if args.text is not None:
         # Text provided directly as a command line argument
         return args.text
-    elif args.file is not None:
-        # Text from a file
-        with open(args.file, "r", encoding="utf-8") as f:
-            return f.read()
-    else:
-        # Text from stdin
-        return sys.stdin.read()
+    # Text from a file, or from stdin
+    return read_input(args.file)
 
 def read_patterns_from_file(file_path: str) -> list[str]:
     """Read patterns from a file, one pattern per line.
@@ -189,45 +211,100 @@ def read_patterns_from_file(file_path: str) -> list[str]:
     Returns:
         list[str]: List of patterns read from the file
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        if not (
-            patterns := [line.strip() for line in f if line.strip()]
-        ):  # Skip empty lines
-            raise ValueError(f"No valid patterns found in {file_path}")
-        return patterns
-
-
-def print_results(
-    matches: list[tuple[int, str]],
-    output_format: str = "text",
-    output_file: str | None = None,
+    # Split the whole file at once, and only decode the non-empty lines
+    with open(file_path, "rb") as f:
+        lines = f.read().splitlines()
+    if not (
+        patterns := [line.decode("utf-8") for line in map(bytes.strip, lines) if line]
+    ):  # Skip empty lines
+        raise ValueError(f"No valid patterns found in {file_path}")
+    return patterns
+
+
+def write_results(
+    matches: Iterable[tuple[int, str]], output_format: str, f: TextIO
 ) -> None:
-    """Print search results in the specified format.
+    """Write search results in the specified format.
+
+    The matches are consumed as they come, and the output lines are collected in a
+    list joined and written out once they reach `OUTPUT_FLUSH_SIZE` characters.
 
     Args:
-        matches: List of matches
+        matches: Iterable of matches
         output_format: Format to print results in ('csv' or 'text')
-        output_file: File to write results to (None for stdout)
+        f: File to write results to
     """
-    # Prepare output file or use stdout
-    with open(output_file, "w", encoding="utf-8") if output_file else sys.stdout as f:
-        # Print header for CSV format
-        if output_format == "csv":
-            print("position,pattern", file=f)
-
-        # Aho-Corasick output (position, pattern)
-        for pos, pattern in matches:
+    buffer: list[str] = []
+    buffered = 0
+    # Print header for CSV format
+    if output_format == "csv":
+        buffer.append("position,pattern\n")
+
+    # The parts of the line around the position only depend on the pattern
+    line_parts: dict[str, tuple[str, str]] = {}
+
+    # Aho-Corasick output (position, pattern)
+    count = 0
+    for count, (pos, pattern) in enumerate(matches, 1):
+        if (parts := line_parts.get(pattern)) is None:
             if output_format == "csv":
                 # Escape any commas in the pattern
                 escaped_pattern = f'"{pattern}"' if "," in pattern else pattern
-                print(f"{pos},{escaped_pattern}", file=f)
+                parts = ("", f",{escaped_pattern}\n")
             else:
-                print(f"Pattern '{pattern}' found at position {pos}", file=f)
+                parts = (f"Pattern '{pattern}' found at position ", "\n")
+            line_parts[pattern] = parts
+        line = f"{parts[0]}{pos}{parts[1]}"
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= OUTPUT_FLUSH_SIZE:
+            f.write("".join(buffer))
+            buffer.clear()
+            buffered = 0
+
+    # Print summary (only for text format)
+    if output_format == "text":
+        buffer.append(f"\nTotal matches found: {count}\n")
+    f.write("".join(buffer))
 
-        # Print summary (only for text format)
-        if output_format == "text":
-            print(f"\nTotal matches found: {len(matches)}", file=f)
 
+def print_results(
+    matches: Iterable[tuple[int, str]],
+    output_format: str = "text",
+    output_file: str | None = None,
+) -> None:
+    """Print search results in the specified format, see `write_results`.
+
+    The matches are found while they are written, so the results are written to a
+    temporary file which replaces the output file once they are complete: a search
+    failing on the text leaves any previous output file as it was.
+
+    Args:
+        matches: Iterable of matches
+        output_format: Format to print results in ('csv' or 'text')
+        output_file: File to write results to (None for stdout)
+    """
+    if not output_file:
+        write_results(matches, output_format, sys.stdout)
+        return
+    f = tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=os.path.dirname(os.path.abspath(output_file)),
+        delete=False,
+    )
+    try:
+        with f:
+            write_results(matches, output_format, f)
+        # The temporary file is only readable by its owner, give it the mode of a
+        # file created by open
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(f.name, 0o666 & ~umask)
+        os.replace(f.name, output_file)
+    except BaseException:
+        os.unlink(f.name)
+        raise
 
 
 def main() -> None:
@@ -249,6 +326,7 @@ def main() -> None:
             algorithm=args.algorithm,
             precompute=not args.no_precompute,
             alphabet=args.alphabet,
+            file_format=args.format,
         )
 
     elif args.command == "strsearch":
@@ -283,6 +361,7 @@ def main() -> None:
                 precompute=not args.no_precompute,
                 alphabet=args.alphabet,
                 save_dfa=args.save_dfa,
+                cache_dir=args.cache_dir,
             )
 
             # Print results
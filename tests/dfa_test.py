@@ -2,8 +2,10 @@
 """Module containing unit tests for the DFA class."""
 
 import unittest
+import base64
 import json
 import tempfile
+from array import array
 from collections import deque
 from enum import Enum
 
@@ -27,6 +29,15 @@ class TestDFA(unittest.TestCase):
         self.assertIsNone(self.dfa.initial_state)
         self.assertEqual(self.dfa.accepting_states, set())
 
+    def test_column_tables(self):
+        """Test the translation tables to the columns are built once per DFA."""
+        self.assertEqual(b"cabx".translate(self.dfa.col_table), bytes([2, 0, 1, 0xFF]))
+        self.assertEqual("cabx".translate(self.dfa.char_col_table), "\x02\x00\x01\xff")
+        # The columns of larger alphabets do not fit in a byte
+        dfa = DFA({chr(code) for code in range(300)})
+        self.assertIsNone(dfa.col_table)
+        self.assertIsNone(dfa.char_col_table)
+
     def test_add_state(self):
         """Test adding states to the DFA."""
         # Add a regular state
@@ -117,6 +128,10 @@ class TestDFA(unittest.TestCase):
         self.assertTrue(self.dfa.is_accepting_state(state2))
         self.dfa.set_accepting(state1, False)
         self.assertFalse(self.dfa.is_accepting_state(state1))
+        self.assertEqual(self.dfa.accepting_states, {state0, state2})
+        self.assertEqual(self.dfa.accept_mask, bytearray([1, 0, 1]))
+        with self.assertRaises(KeyError):
+            self.dfa.set_accepting(state1, False)
 
         # Test error cases
         with self.assertRaises(ValueError):
@@ -153,6 +168,23 @@ class TestDFA(unittest.TestCase):
         with self.assertRaises(ValueError):
             list(dfa_without_initial.bfs_traverse())
 
+    def test_bfs_traverse_expands_states_once(self):
+        """Test each state is expanded once when it is reached by several paths."""
+        # A chain of diamonds, the number of paths doubles with each diamond
+        dfa = DFA(set("ab"))
+        top = dfa.add_state(is_initial=True)
+        for _ in range(16):
+            left, right, bottom = dfa.add_state(), dfa.add_state(), dfa.add_state()
+            dfa.add_transition(top, "a", left)
+            dfa.add_transition(top, "b", right)
+            dfa.add_transition(left, "a", bottom)
+            dfa.add_transition(right, "a", bottom)
+            top = bottom
+
+        traversal = list(dfa.bfs_traverse())
+        self.assertEqual(len(traversal), 16 * 4)
+        self.assertEqual(len(set(traversal)), 16 * 4)
+
     def test_has_transition(self):
         """Test has_transition method."""
         # Create a simple DFA
@@ -166,6 +198,90 @@ class TestDFA(unittest.TestCase):
         self.assertFalse(self.dfa.has_transition(state0, "b"))
         self.assertFalse(self.dfa.has_transition(state1, "a"))
 
+    def test_transition_by_col(self):
+        """Test transitions addressed by the column of the symbol."""
+        state0 = self.dfa.add_state(is_initial=True)
+        state1 = self.dfa.add_state()
+        self.dfa.add_transition(state0, "b", state1)
+
+        self.assertEqual(self.dfa.symbols, ("a", "b", "c"))
+        self.assertEqual(self.dfa.transition_by_col(state0, 1), state1)
+        self.assertIsNone(self.dfa.transition_by_col(state0, 0))
+        self.assertIsNone(self.dfa.transition_by_col(state1, 1))
+
+    def test_flat_tables(self):
+        """Test the flat tables follow the states and the transitions."""
+        state0 = self.dfa.add_state(is_initial=True)
+        state1 = self.dfa.add_state()
+        self.dfa.add_transition(state0, "b", state1)
+        self.dfa.add_transition(state1, "a", state0, TransitionType.FAILURE)
+        self.assertEqual(list(self.dfa.table), [-1, state1, -1, state0, -1, -1])
+        self.assertEqual(self.dfa.failure_mask, bytearray([0, 0, 0, 1, 0, 0]))
+        self.assertIsNone(self.dfa.transition(state0, "a"))
+        self.assertIsNone(self.dfa.transition(state0, "d"))
+        self.assertEqual(
+            self.dfa.transition_types,
+            {
+                state0: {"b": TransitionType.SUCCESS},
+                state1: {"a": TransitionType.FAILURE},
+            },
+        )
+
+        # The accepting flags follow the accepting states
+        self.assertEqual(self.dfa.accept_mask, bytearray(2))
+        state2 = self.dfa.add_state(is_accepting=True)
+        self.dfa.add_accepting(state1)
+        self.dfa.set_accepting(state2, False)
+        self.assertEqual(self.dfa.accept_mask, bytearray([0, 1, 0]))
+        self.assertTrue(self.dfa.is_accepting_state(state1))
+        self.assertFalse(self.dfa.is_accepting_state(state2))
+
+    def test_finalize(self):
+        """Test rebuilding the flat tables after assigning the transitions."""
+        self.dfa.add_state(is_initial=True)
+        self.dfa.add_state()
+        self.dfa.add_transition(0, "a", 1, TransitionType.FAILURE)
+        self.dfa.transitions[1] = {"c": 0}
+        self.dfa.accepting_states = {1}
+
+        self.dfa.finalize()
+        self.assertEqual(list(self.dfa.table), [1, -1, -1, -1, -1, 0])
+        self.assertEqual(self.dfa.accept_mask, bytearray([0, 1]))
+        self.assertEqual(self.dfa.get_transition_type(0, "a"), TransitionType.FAILURE)
+        self.assertEqual(self.dfa.get_transition_type(1, "c"), TransitionType.SUCCESS)
+        self.assertIsNone(self.dfa.get_transition_type(1, "a"))
+
+    def test_from_table(self):
+        """Test creating a DFA from a prebuilt flat table."""
+        table = array("i", [1, 0, 0, -1, -1, -1, 1, 2, -1])
+        dfa = DFA.from_table(
+            self.alphabets, table, {2}, failure_mask=bytearray([0, 1, 1] + [0] * 6)
+        )
+        self.assertEqual(dfa.n_states(), 3)
+        self.assertEqual(dfa.initial_state, 0)
+        self.assertEqual(dfa.transitions, {0: {"a": 1, "b": 0, "c": 0}, 2: {"a": 1, "b": 2}})
+        self.assertEqual(dfa.accept_mask, bytearray([0, 0, 1]))
+        self.assertTrue(dfa.is_accepting_state(2))
+        self.assertEqual(dfa.get_transition_type(0, "a"), TransitionType.SUCCESS)
+        self.assertEqual(dfa.get_transition_type(0, "b"), TransitionType.FAILURE)
+        self.assertIsNone(dfa.transition(1, "a"))
+
+        # The DFA can still be extended one transition at a time
+        dfa.add_transition(1, "a", 2)
+        self.assertEqual(dfa.transition(1, "a"), 2)
+
+    def test_from_table_builds_transitions_when_needed(self):
+        """Test the transitions of a DFA from a table follow its later changes."""
+        table = array("i", [1, 0, -1, -1])
+        dfa = DFA.from_table(set("ab"), table, {1})
+        self.assertEqual(list(dfa.bfs_traverse()), [(0, "a", 1)])
+        # Transitions added before and after the dictionaries are built
+        dfa.add_transition(1, "a", 1)
+        self.assertEqual(dfa.transitions, {0: {"a": 1, "b": 0}, 1: {"a": 1}})
+        dfa.add_transition(1, "b", 0)
+        self.assertEqual(dfa.transitions[1], {"a": 1, "b": 0})
+        self.assertEqual(DFA.from_dict(dfa.to_dict()).table, dfa.table)
+
     def test_n_states(self):
         """Test n_states method."""
         # Empty DFA
@@ -216,6 +332,38 @@ class TestDFA(unittest.TestCase):
         self.assertEqual(new_dfa.get_transition_type(state0, "a"), TransitionType.SUCCESS)
         self.assertEqual(new_dfa.get_transition_type(state0, "c"), TransitionType.FAILURE)
 
+    def test_to_dict_is_deterministic(self):
+        """Test the serialized alphabets and accepting states are sorted."""
+        for state in range(12):
+            self.dfa.add_state(is_initial=state == 0)
+        for state in (9, 1, 11, 4):
+            self.dfa.add_accepting(state)
+        dfa_dict = self.dfa.to_dict()
+        self.assertEqual(dfa_dict["alphabets"], ["a", "b", "c"])
+        self.assertEqual(dfa_dict["accepting_states"], [1, 4, 9, 11])
+
+    def test_to_bytes_and_from_bytes(self):
+        """Test binary serialization and deserialization."""
+        state0 = self.dfa.add_state(is_initial=True)
+        state1 = self.dfa.add_state()
+        state2 = self.dfa.add_state(is_accepting=True)
+        self.dfa.add_transition(state0, "a", state1)
+        self.dfa.add_transition(state1, "b", state2)
+        self.dfa.add_transition(state0, "c", state0, TransitionType.FAILURE)
+
+        new_dfa = DFA.from_bytes(self.dfa.to_bytes())
+        self.assertEqual(new_dfa.states, self.dfa.states)
+        self.assertEqual(new_dfa.alphabets, self.dfa.alphabets)
+        self.assertEqual(new_dfa.initial_state, self.dfa.initial_state)
+        self.assertEqual(new_dfa.accepting_states, self.dfa.accepting_states)
+        self.assertEqual(new_dfa.transitions, self.dfa.transitions)
+        self.assertEqual(new_dfa.table, self.dfa.table)
+        self.assertEqual(new_dfa.get_transition_type(state0, "c"), TransitionType.FAILURE)
+        self.assertEqual(new_dfa.get_transition_type(state1, "b"), TransitionType.SUCCESS)
+
+        with self.assertRaises(ValueError):
+            DFA.from_bytes(b"JSON" + self.dfa.to_bytes()[4:])
+
     def test_to_json_and_from_json(self):
         """Test JSON serialization and deserialization."""
         # Create a simple DFA
@@ -234,3 +382,17 @@ class TestDFA(unittest.TestCase):
         self.assertEqual(new_dfa.states, self.dfa.states)
         self.assertEqual(new_dfa.transition(state0, "a"), state1)
         self.assertTrue(new_dfa.is_accepting_state(state1))
+
+    def test_from_dict_with_transition_types(self):
+        """Test the dictionaries holding the type of each transition are read."""
+        state0 = self.dfa.add_state(is_initial=True)
+        state1 = self.dfa.add_state(is_accepting=True)
+        self.dfa.add_transition(state0, "a", state1)
+        self.dfa.add_transition(state1, "a", state1, TransitionType.FAILURE)
+        data = self.dfa.to_dict()
+        failure_mask = base64.b64decode(data.pop("failure_mask"))
+        self.assertEqual(failure_mask, bytes([0, 0, 0, 1, 0, 0]))
+        data["transition_types"] = {"0": {"a": "success"}, "1": {"a": "failure"}}
+        new_dfa = DFA.from_dict(data)
+        self.assertEqual(new_dfa.failure_mask, self.dfa.failure_mask)
+        self.assertEqual(new_dfa.transition_types, self.dfa.transition_types)
@@ -1,7 +1,16 @@
 """Unit tests for the Aho-Corasick string matching algorithm."""
 
 import unittest
-from strings.ahocorasick import AhoCorasickMatcher
+from array import array
+from unittest import mock
+from strings.ahocorasick import (
+    OUT_OF_ALPHABET,
+    AhoCorasickMatcher,
+    alphabet_set_from_alphabets,
+    column_table,
+)
+from strings._ac_kernel import scan
+from strings.dfa import TransitionType
 
 
 class TestAhoCorasickMatcher(unittest.TestCase):
@@ -103,3 +112,242 @@ class TestAhoCorasickMatcher(unittest.TestCase):
         matches = list(matcher.search("XXXXABC"))
         self.assertEqual(len(matches), 1)
         self.assertEqual(matches[0], (4, "ABC"))
+
+    def test_flattened_transitions(self):
+        """Test the flattened table agrees with the DFA transitions"""
+        matcher = AhoCorasickMatcher(
+            patterns=self.simple_patterns, compute_transitions=True
+        )
+        self.assertIsNotNone(matcher.goto)
+        for a in matcher.dfa.alphabets:
+            col = matcher.dfa.col_table[ord(a)]
+            for state in range(matcher.dfa.n_states()):
+                self.assertEqual(
+                    matcher.goto[state * matcher.width + col],
+                    matcher.dfa.transition(state, a),
+                )
+        self.assertEqual(matcher.dfa.col_table[ord("X")], OUT_OF_ALPHABET)
+
+    def test_non_byte_alphabet(self):
+        """Test alphabets outside of latin-1 are searched over columns"""
+        matcher = AhoCorasickMatcher(patterns=["αβ"], compute_transitions=True)
+        self.assertIsNotNone(matcher.goto)
+        self.assertEqual(list(matcher.search("ααβα")), [(1, "αβ")])
+        for compute_transitions in (True, False):
+            matcher = AhoCorasickMatcher(["αβ", "Aα"], compute_transitions, "Aαβ")
+            self.assertEqual(
+                list(matcher.search("AαβAα")), [(0, "Aα"), (1, "αβ"), (3, "Aα")]
+            )
+            self.assertEqual(list(matcher.search(b"AA")), [])
+            with self.assertRaises(ValueError):
+                list(matcher.search("αβγ"))
+
+    def test_symbol_outside_alphabet(self):
+        """Test that precomputed search rejects symbols outside of the alphabet"""
+        matcher = AhoCorasickMatcher(patterns=["AB"], compute_transitions=True)
+        with self.assertRaises(ValueError):
+            list(matcher.search("ABC"))
+
+    def test_match_across_scan_blocks(self):
+        """Test matches spanning the blocks handed to the scanning kernel"""
+        matcher = AhoCorasickMatcher(patterns=["ABC", "CA"], compute_transitions=True)
+        with mock.patch("strings.ahocorasick.SCAN_BLOCK_SIZE", 2):
+            matches = list(matcher.search("AABCABC"))
+        self.assertEqual(matches, [(1, "ABC"), (3, "CA"), (4, "ABC")])
+
+    def test_batched_search(self):
+        """Test the block-composed search agrees with the sequential search"""
+        matcher = AhoCorasickMatcher(
+            patterns=["ACA", "CAG", "GGAC"], alphabets="ACGT", compute_transitions=True
+        )
+        text = "ACACAGGACAGTTACAGGACA" * 3
+        for block_size in (1, 2, 5, 1024):
+            self.assertEqual(
+                list(matcher.batched_search(text, block_size=block_size)),
+                list(matcher.search(text)),
+            )
+        self.assertEqual(list(matcher.batched_search("")), [])
+
+    def test_batched_search_non_byte_alphabet(self):
+        """Test the block-composed search of alphabets outside of latin-1"""
+        matcher = AhoCorasickMatcher(["αβ", "βγ"], compute_transitions=True)
+        text = "αβγβγαβ"
+        for block_size in (1, 2, 1024):
+            self.assertEqual(
+                list(matcher.batched_search(text, block_size=block_size)),
+                [(0, "αβ"), (1, "βγ"), (3, "βγ"), (5, "αβ")],
+            )
+        with self.assertRaises(ValueError):
+            list(matcher.batched_search("αβδ"))
+
+    def test_alphabet_set_from_alphabets(self):
+        """Test the dense alphabet built from the patterns or the alphabets"""
+        self.assertEqual(
+            alphabet_set_from_alphabets(None, ["CAB", "BA"]), ("A", "B", "C")
+        )
+        self.assertEqual(
+            alphabet_set_from_alphabets("TGCA", ["CAB"]), ("A", "C", "G", "T")
+        )
+
+    def test_column_table(self):
+        """Test translating bytes to the columns of the alphabet"""
+        table = column_table(("A", "C", "G", "T"))
+        self.assertEqual(len(table), 256)
+        self.assertEqual(b"GATTACA".translate(table), bytes([2, 0, 3, 3, 0, 1, 0]))
+        self.assertEqual(b"N".translate(table), bytes([OUT_OF_ALPHABET]))
+
+    def test_large_alphabet(self):
+        """Test alphabets too large for the translation table fall back to the DFA"""
+        alphabets = "".join(map(chr, range(OUT_OF_ALPHABET)))
+        matcher = AhoCorasickMatcher(
+            patterns=["AB"], alphabets=alphabets, compute_transitions=True
+        )
+        self.assertIsNone(matcher.goto)
+        self.assertEqual(list(matcher.search("CABAB")), [(1, "AB"), (3, "AB")])
+        matcher = AhoCorasickMatcher(
+            patterns=["AB"], alphabets=alphabets[1:], compute_transitions=True
+        )
+        self.assertIsNotNone(matcher.goto)
+        self.assertEqual(list(matcher.search("CABAB")), [(1, "AB"), (3, "AB")])
+
+    def test_build_trie(self):
+        """Test the trie is built over the columns of the symbols"""
+        matcher = AhoCorasickMatcher(patterns=["AB"], compute_transitions=False)
+        trie, pattern_map = matcher._build_trie(("A", "B", "C"), ["AB", "AC", "B"])
+        self.assertEqual(trie, [{0: 1, 1: 4}, {1: 2, 2: 3}, {}, {}, {}])
+        self.assertEqual(pattern_map, {2: "AB", 3: "AC", 4: "B"})
+        with self.assertRaises(ValueError):
+            matcher._build_trie(("A", "B"), ["AC"])
+
+    def test_failure_into_sibling_branch(self):
+        """Test failing from a top level state into another branch of the trie"""
+        for compute_transitions in (True, False):
+            matcher = AhoCorasickMatcher(
+                patterns=["AC", "BC"], compute_transitions=compute_transitions
+            )
+            self.assertEqual(list(matcher.search("ABC")), [(1, "BC")])
+
+    def test_on_the_fly_failure_chain(self):
+        """Test following several failure links on-the-fly"""
+        matcher = AhoCorasickMatcher(
+            patterns=["BB"], alphabets="AB", compute_transitions=False
+        )
+        self.assertEqual(list(matcher.search("BBABB")), [(0, "BB"), (3, "BB")])
+
+        matcher = AhoCorasickMatcher(
+            patterns=["ABAC", "CD"], alphabets="ABCD", compute_transitions=False
+        )
+        self.assertEqual(list(matcher.search("ABACD")), [(0, "ABAC"), (3, "CD")])
+        # The intermediate states of the failure chain get the transition too
+        self.assertEqual(list(matcher.search("ABB")), [])
+        self.assertEqual(matcher.dfa.transition(0, "B"), 0)
+        self.assertEqual(
+            matcher.dfa.get_transition_type(0, "B"), TransitionType.FAILURE
+        )
+
+    def test_compiled_scanner(self):
+        """Test the specialized scanner agrees with the generic kernel"""
+        matcher = AhoCorasickMatcher(
+            patterns=["ACA", "CAG", "GGAC"], alphabets="ACGT", compute_transitions=True
+        )
+        self.assertIsNotNone(matcher._scan)
+        text = b"ACACAGGACAGTTACAGGACA".translate(matcher.col_table)
+        # Cover every length of the tail left by the unrolled loop
+        for end in range(len(text) - 4, len(text) + 1):
+            compiled_pos, compiled_state = array("i"), array("i")
+            kernel_pos, kernel_state = array("i"), array("i")
+            self.assertEqual(
+                matcher._scan(text[:end], 0, 5, compiled_pos, compiled_state),
+                scan(
+                    matcher.goto,
+                    matcher.width,
+                    matcher.accept_mask,
+                    text[:end],
+                    0,
+                    5,
+                    kernel_pos,
+                    kernel_state,
+                ),
+            )
+            self.assertEqual(compiled_pos, kernel_pos)
+            self.assertEqual(compiled_state, kernel_state)
+
+        lazy = AhoCorasickMatcher(patterns=["ACA"], compute_transitions=False)
+        self.assertIsNone(lazy._scan)
+
+    def test_search_bytes(self):
+        """Test searching buffers, one byte per symbol"""
+        for compute_transitions in (True, False):
+            matcher = AhoCorasickMatcher(
+                patterns=["ACA"], alphabets="ACGT", compute_transitions=compute_transitions
+            )
+            expected = [(0, "ACA"), (2, "ACA"), (7, "ACA")]
+            self.assertEqual(list(matcher.search(b"ACACAGGACAGT")), expected)
+            self.assertEqual(
+                list(matcher.search(memoryview(bytearray(b"ACACAGGACAGT")))), expected
+            )
+
+    def test_lazy_search_over_columns(self):
+        """Test the on-the-fly search translates the text to columns by blocks"""
+        matcher = AhoCorasickMatcher(
+            patterns=["ACA", "CAG"], alphabets="ACGT", compute_transitions=False
+        )
+        self.assertIsNone(matcher.goto)
+        self.assertIsNotNone(matcher.col_table)
+        expected = [(0, "ACA"), (2, "ACA"), (3, "CAG"), (7, "ACA"), (8, "CAG")]
+        with mock.patch("strings.ahocorasick.SCAN_BLOCK_SIZE", 5):
+            self.assertEqual(list(matcher.search("ACACAGGACAGT")), expected)
+        with self.assertRaises(ValueError):
+            list(matcher.search("ACX"))
+
+    def test_pattern_prefix_of_another(self):
+        """Test a pattern which is a prefix of another pattern"""
+        for patterns in (["ABABAC", "ABAB"], ["ABAB", "ABABAC"]):
+            for compute_transitions in (True, False):
+                matcher = AhoCorasickMatcher(
+                    patterns=patterns, compute_transitions=compute_transitions
+                )
+                self.assertEqual(
+                    list(matcher.search("ABABAC")), [(0, "ABAB"), (0, "ABABAC")]
+                )
+                self.assertEqual(matcher.pattern_map, {4: "ABAB", 6: "ABABAC"})
+                self.assertEqual(list(matcher.pattern_len), [0, 0, 0, 0, 4, 0, 6])
+
+    def test_scanner_code_is_shared(self):
+        """Test matchers over the same alphabet share the compiled scanner code"""
+        first = AhoCorasickMatcher(["ACA", "CAG"], True, "ACGT")
+        second = AhoCorasickMatcher(["GTA", "TTG"], True, "ACGT")
+        self.assertIs(first._scan.__code__, second._scan.__code__)
+        self.assertIsNot(first._scan.__globals__, second._scan.__globals__)
+        self.assertEqual(list(first.search("ACAG")), [(0, "ACA"), (1, "CAG")])
+        self.assertEqual(list(second.search("GTTG")), [(1, "TTG")])
+
+    def test_search_ids(self):
+        """Test the matches identified by the index of their pattern"""
+        patterns = ["ABABAC", "ABAB", "BA"]
+        for compute_transitions in (True, False):
+            matcher = AhoCorasickMatcher(
+                patterns=patterns, compute_transitions=compute_transitions
+            )
+            self.assertEqual(matcher.patterns, patterns)
+            matches = list(matcher.search_ids("ABABACBA"))
+            self.assertEqual(matches, [(0, 1), (0, 0), (6, 2)])
+            self.assertEqual(
+                [(pos, patterns[i]) for pos, i in matches],
+                list(matcher.search("ABABACBA")),
+            )
+
+    def test_skip_scanner_with_several_start_symbols(self):
+        """Test the scanner skipping to the next symbol starting a pattern"""
+        matcher = AhoCorasickMatcher(["XAY", "ZA"], True, "ABCXYZ")
+        self.assertEqual(matcher._scan.__name__, "scan_with_skip")
+        text = "ABC" * 20 + "XAYZA" + "CBA" * 20 + "ZXAY"
+        expected = [(60, "XAY"), (63, "ZA"), (126, "XAY")]
+        for block_size in (2, 3, 7, 1 << 16):
+            with mock.patch("strings.ahocorasick.SCAN_BLOCK_SIZE", block_size):
+                self.assertEqual(list(matcher.search(text)), expected)
+        # Dense blocks go through the plain scanner
+        self.assertEqual(
+            list(matcher.search("ZAXAY" * 2)),
+            [(0, "ZA"), (2, "XAY"), (5, "ZA"), (7, "XAY")],
+        )
@@ -5,7 +5,9 @@ including pattern matching with various inputs, edge cases, and both precomputed
 on-the-fly transition computation modes.
 """
 
+import pickle
 import unittest
+from unittest import mock
 from strings.kmp import KMPMatcher
 
 
@@ -69,3 +71,130 @@ class TestKMPMatcher(unittest.TestCase):
         """Test repeated pattern."""
         matcher = KMPMatcher("AA", compute_transitions=True)
         self.assertEqual(list(matcher.search("AAAA")), [(0,"AA"), (1,"AA"), (2,"AA")])
+
+    @mock.patch("strings.kmp.FIND_MAX_LENGTH", 0)
+    def test_compiled_scanner(self):
+        """Test the scanner on the flat table agrees with the DFA search."""
+        matcher = KMPMatcher("ABAB", alphabets="ABC", compute_transitions=True)
+        self.assertIsNotNone(matcher._scan)
+        text = "ABABABCABAB"
+        expected = [(0, "ABAB"), (2, "ABAB"), (7, "ABAB")]
+        self.assertEqual(list(matcher.search(text)), expected)
+        self.assertEqual(list(matcher.search(text.encode())), expected)
+        with mock.patch("strings.kmp.SCAN_BLOCK_SIZE", 3):
+            self.assertEqual(list(matcher.search(text)), expected)
+        with self.assertRaises(ValueError):
+            list(matcher.search("ABX"))
+
+    def test_non_byte_alphabet(self):
+        """Test alphabets outside of latin-1 are searched over columns."""
+        matcher = KMPMatcher("αβ", compute_transitions=True)
+        self.assertIsNotNone(matcher._scan)
+        self.assertEqual(list(matcher.search("ααβα")), [(1, "αβ")])
+        for compute_transitions in (True, False):
+            matcher = KMPMatcher("αβα", compute_transitions, alphabets="Aαβ")
+            self.assertEqual(
+                list(matcher.search("αβαβαAαβα")),
+                [(0, "αβα"), (2, "αβα"), (6, "αβα")],
+            )
+            self.assertEqual(list(matcher.search(b"A")), [])
+            with self.assertRaises(ValueError):
+                list(matcher.search("αβγ"))
+
+    def test_pickle(self):
+        """Test the scanner is regenerated when the matcher is unpickled."""
+        matcher = pickle.loads(pickle.dumps(KMPMatcher("AA", compute_transitions=True)))
+        self.assertIsNotNone(matcher._scan)
+        self.assertEqual(list(matcher.search("AAA")), [(0, "AA"), (1, "AA")])
+
+    def test_precomputed_table(self):
+        """Test the precomputed transitions against the failure functions."""
+        matcher = KMPMatcher("ABABC", alphabets="ABC", compute_transitions=True)
+        dfa = matcher.dfa
+        self.assertEqual(dfa.initial_state, 0)
+        self.assertEqual(matcher.fail_functions, [0, 0, 1, 2, 0])
+        expected = {
+            0: {"A": 1, "B": 0, "C": 0},
+            1: {"A": 1, "B": 2, "C": 0},
+            2: {"A": 3, "B": 0, "C": 0},
+            3: {"A": 1, "B": 4, "C": 0},
+            4: {"A": 3, "B": 0, "C": 5},
+            5: {"A": 1, "B": 0, "C": 0},
+        }
+        for state, row in expected.items():
+            for sym, to_state in row.items():
+                self.assertEqual(dfa.transition(state, sym), to_state)
+        self.assertEqual(list(matcher.search("ABABABC")), [(2, "ABABC")])
+
+    def test_lazy_transitions_follow_fail_chain(self):
+        """Test the lazy search follows the whole chain of fail functions."""
+        pattern = "AABAAA"
+        lazy = KMPMatcher(pattern, alphabets="ABC", compute_transitions=False)
+        precomputed = KMPMatcher(pattern, alphabets="ABC", compute_transitions=True)
+        self.assertEqual(lazy.fail_functions, precomputed.fail_functions)
+        text = "AABAABAAAAABAAACAABAAA"
+        expected = list(precomputed.search(text))
+        self.assertEqual(expected, [(3, pattern), (9, pattern), (16, pattern)])
+        self.assertEqual(list(lazy.search(text)), expected)
+        # The transitions cached by the first search give the same matches
+        self.assertEqual(list(lazy.search(text)), expected)
+        # The states visited on the fail chain got the transition cached too
+        self.assertEqual(lazy.dfa.transition(6, "C"), 0)
+        self.assertEqual(lazy.dfa.transition(2, "C"), 0)
+        self.assertIsNone(lazy.dfa.transition(3, "C"))
+        with self.assertRaises(ValueError):
+            list(lazy.search("AAX"))
+
+    def test_lazy_search_on_bytes(self):
+        """Test the lazy search runs over the columns of the bytes of the text."""
+        matcher = KMPMatcher("ABA", alphabets="ABC", compute_transitions=False)
+        self.assertIsNone(matcher._scan)
+        self.assertIsNotNone(matcher.col_table)
+        text = "ABABACABA"
+        expected = [(0, "ABA"), (2, "ABA"), (6, "ABA")]
+        self.assertEqual(list(matcher.search(text.encode())), expected)
+        with mock.patch("strings.kmp.SCAN_BLOCK_SIZE", 2):
+            self.assertEqual(list(matcher.search(bytearray(text.encode()))), expected)
+        with self.assertRaises(ValueError):
+            list(matcher.search(b"ABX"))
+
+    @mock.patch("strings.kmp.FIND_MAX_LENGTH", 0)
+    def test_narrow_scanner_table(self):
+        """Test the scanner table uses the narrowest type holding its entries."""
+        matcher = KMPMatcher("ABAB", alphabets="ABC", compute_transitions=True)
+        self.assertEqual(matcher._scan.__globals__["GOTO"].typecode, "b")
+        long_pattern = "AB" * 30
+        matcher = KMPMatcher(long_pattern, alphabets="ABC", compute_transitions=True)
+        self.assertEqual(matcher._scan.__globals__["GOTO"].typecode, "h")
+        self.assertEqual(
+            list(matcher.search("C" + long_pattern + "AB")),
+            [(1, long_pattern), (3, long_pattern)],
+        )
+
+    @mock.patch("strings.kmp.FIND_MAX_LENGTH", 0)
+    def test_skip_scanner(self):
+        """Test the scanner skipping the root agrees with the dense scanner."""
+        matcher = KMPMatcher("ABA", alphabets="ABCD", compute_transitions=True)
+        self.assertEqual(matcher._scan.__name__, "scan_with_skip")
+        text = "CD" * 20 + "ABABA" + "DC" * 20 + "AB" + "ACA"
+        expected = [(40, "ABA"), (42, "ABA"), (85, "ABA")]
+        for block_size in (2, 3, 7, 1 << 16):
+            with mock.patch("strings.kmp.SCAN_BLOCK_SIZE", block_size):
+                self.assertEqual(list(matcher.search(text)), expected)
+        # Dense blocks go through the plain scanner
+        self.assertEqual(
+            list(matcher.search("ABAB" * 3)), [(i, "ABA") for i in range(0, 10, 2)]
+        )
+
+    def test_find_search(self):
+        """Test short patterns are found with bytes.find, across the blocks."""
+        matcher = KMPMatcher("ABA", alphabets="ABC", compute_transitions=True)
+        self.assertEqual(matcher._pattern_cols, bytes([0, 1, 0]))
+        text = "ABABACABA"
+        expected = [(0, "ABA"), (2, "ABA"), (6, "ABA")]
+        for block_size in (1, 2, 4, 1 << 16):
+            with mock.patch("strings.kmp.SCAN_BLOCK_SIZE", block_size):
+                self.assertEqual(list(matcher.search(text)), expected)
+                self.assertEqual(list(matcher.search(text.encode())), expected)
+        with self.assertRaises(ValueError):
+            list(matcher.search("ABAX"))
@@ -0,0 +1,287 @@
+"""Unit tests for the string pattern matching application functions."""
+
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+from strings.ahocorasick import AhoCorasickMatcher
+from strings.kmp import KMPMatcher
+from strings.stringsapp import (
+    MATCHER_CACHE_VERSION,
+    build_dfa,
+    build_matcher,
+    decode_input,
+    invalidate_loaded_matchers,
+    load_matcher_from_file,
+    matcher_cache_path,
+    read_input,
+    read_matcher_file,
+    search_with_patterns,
+)
+
+
+class TestBuildMatcher(unittest.TestCase):
+    """Unit tests for build_matcher."""
+
+    def setUp(self):
+        # Each test gets its own cache directory
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_without_cache(self):
+        """Test the matcher is built when no cache directory is given"""
+        matcher = build_matcher(["ABC"], "kmp", True, "ABC")
+        self.assertIsInstance(matcher, KMPMatcher)
+        self.assertEqual(list(matcher.search("ABCABC")), [(0, "ABC"), (3, "ABC")])
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_cache_hit(self):
+        """Test a cached matcher is loaded instead of being rebuilt"""
+        for precompute in (True, False):
+            args = (["ABABAC", "ABAB"], "aho-corasick", precompute, "ABC")
+            built = build_matcher(*args, cache_dir=self.cache_dir)
+            self.assertTrue(os.path.exists(matcher_cache_path(self.cache_dir, *args)))
+            with mock.patch("strings.stringsapp.AhoCorasickMatcher") as constructor:
+                loaded = build_matcher(*args, cache_dir=self.cache_dir)
+            constructor.assert_not_called()
+            self.assertIsInstance(loaded, AhoCorasickMatcher)
+            self.assertEqual(
+                list(loaded.search("ABABABAC")), list(built.search("ABABABAC"))
+            )
+            self.assertEqual(loaded.goto, built.goto)
+            if precompute:
+                self.assertIsNotNone(loaded._scan)
+
+    def test_stale_cache(self):
+        """Test cached matchers of other versions or unreadable are built again"""
+        args = (["AB", "BC"], "aho-corasick", True, None)
+        path = matcher_cache_path(self.cache_dir, *args)
+        os.makedirs(self.cache_dir)
+        stale = AhoCorasickMatcher(["XY"], True)
+        for content in (
+            pickle.dumps(stale),
+            pickle.dumps((MATCHER_CACHE_VERSION - 1, stale)),
+            b"not a pickle",
+            b"",
+        ):
+            with open(path, "wb") as f:
+                f.write(content)
+            matcher = build_matcher(*args, cache_dir=self.cache_dir)
+            self.assertEqual(
+                list(matcher.search("ABCAB")), [(0, "AB"), (1, "BC"), (3, "AB")]
+            )
+            # The entry is overwritten, and loaded on the next run
+            with mock.patch("strings.stringsapp.AhoCorasickMatcher") as constructor:
+                loaded = build_matcher(*args, cache_dir=self.cache_dir)
+            constructor.assert_not_called()
+            self.assertEqual(loaded.patterns, ["AB", "BC"])
+
+    def test_cache_key(self):
+        """Test matchers built with different options are cached separately"""
+        paths = {
+            matcher_cache_path(self.cache_dir, ["AB"], "aho-corasick", True, None),
+            matcher_cache_path(self.cache_dir, ["AB"], "aho-corasick", False, None),
+            matcher_cache_path(self.cache_dir, ["AB"], "kmp", True, None),
+            matcher_cache_path(self.cache_dir, ["AB"], "aho-corasick", True, "ABC"),
+            matcher_cache_path(self.cache_dir, ["AB", "B"], "aho-corasick", True, None),
+        }
+        self.assertEqual(len(paths), 5)
+
+
+class TestReadInput(unittest.TestCase):
+    """Unit tests for read_input."""
+
+    def test_memory_mapped_file(self):
+        """Test files are mapped and searched without decoding"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            with open(path, "wb") as f:
+                f.write(b"ABCABC")
+            text = read_input(path)
+            self.assertEqual(bytes(text), b"ABCABC")
+            matcher = build_matcher(["ABC"], "aho-corasick", True, "ABC")
+            self.assertEqual(list(matcher.search(text)), [(0, "ABC"), (3, "ABC")])
+            text.close()
+
+            # An empty file cannot be mapped
+            open(path, "wb").close()
+            self.assertEqual(read_input(path), b"")
+
+    def test_utf8_file(self):
+        """Test UTF-8 files are decoded when the alphabet is not ASCII"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            with open(path, "wb") as f:
+                f.write("αβγ café".encode("utf-8"))
+            text = read_input(path)
+            matcher = build_matcher(["αβ", "βγ"], "aho-corasick", True, "αβγ é")
+            self.assertEqual(decode_input(text, matcher), "αβγ café")
+            for algorithm in ("kmp", "aho-corasick"):
+                matches = search_with_patterns(
+                    text, ["é"], algorithm, True, "αβγ café"
+                )
+                self.assertEqual(list(matches), [(7, "é")])
+            # The bytes of ASCII alphabets are searched as they are
+            matcher = build_matcher(["ABC"], "aho-corasick", True, "ABC")
+            self.assertIs(decode_input(text, matcher), text)
+            text.close()
+
+
+class TestBuildDfa(unittest.TestCase):
+    """Unit tests for saving and loading DFA files."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The tests share a directory, and the DFA files of the same patterns which
+        # they only read
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.dfa_files = {}
+        for algorithm in ("kmp", "aho-corasick"):
+            path = cls.dfa_files[algorithm] = cls.path(f"{algorithm}.json")
+            with mock.patch("builtins.print"):
+                build_dfa(["ABAB"], path, algorithm, True, "ABC")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    @classmethod
+    def path(cls, name):
+        """Get the path of a file in the directory of the tests."""
+        return os.path.join(cls.tmp_dir.name, name)
+
+    def test_compact_round_trip(self):
+        """Test the DFA file is written compact and loads back"""
+        for path in self.dfa_files.values():
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+            self.assertNotIn("\n", content)
+            self.assertNotIn(": ", content)
+            matcher = load_matcher_from_file(path)
+            self.assertEqual(list(matcher.search("ABABAB")), [(0, "ABAB"), (2, "ABAB")])
+
+    def test_binary_round_trip(self):
+        """Test the binary DFA file holds the DFA as is and loads back"""
+        for algorithm in ("kmp", "aho-corasick"):
+            path = self.path(f"{algorithm}.dfa")
+            with mock.patch("builtins.print"):
+                build_dfa(["ABAB"], path, algorithm, True, "ABC", "binary")
+            matcher = load_matcher_from_file(path)
+            with open(path, "rb") as f:
+                self.assertTrue(f.read().endswith(matcher.dfa.to_bytes()))
+            self.assertEqual(list(matcher.search("ABABAB")), [(0, "ABAB"), (2, "ABAB")])
+        with self.assertRaises(ValueError):
+            build_dfa(["ABAB"], self.path("unknown.dfa"), "kmp", True, "ABC", "xml")
+
+    def test_json_without_orjson(self):
+        """Test the DFA files are the same JSON whether orjson is used or not"""
+        path = self.path("without_orjson.json")
+        with mock.patch("builtins.print"), mock.patch(
+            "strings.stringsapp.orjson", None
+        ):
+            build_dfa(["ABAB"], path, "aho-corasick", True, "ABC")
+            matcher = read_matcher_file(path)
+        self.assertEqual(list(matcher.search("ABABAB")), [(0, "ABAB"), (2, "ABAB")])
+        with open(path, "rb") as f, open(self.dfa_files["aho-corasick"], "rb") as g:
+            self.assertEqual(json.load(f), json.load(g))
+
+    def test_build_dfa_returns_matcher(self):
+        """Test the built matcher is returned, and matches the saved one"""
+        for algorithm in ("kmp", "aho-corasick"):
+            path = self.path(f"returned_{algorithm}.json")
+            with mock.patch("builtins.print"):
+                built = build_dfa(["ABAB", "BC"], path, algorithm, True, "ABC")
+            self.assertIsInstance(built, type(load_matcher_from_file(path)))
+            self.assertEqual(
+                list(built.search("ABABCABAB")),
+                list(load_matcher_from_file(path).search("ABABCABAB")),
+            )
+
+    def test_pattern_states(self):
+        """Test the DFA file holds the accepting state of each pattern"""
+        path = self.path("pattern_states.json")
+        with mock.patch("builtins.print"):
+            build_dfa(["ABAB", "BC"], path, "aho-corasick", True, "ABC")
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertNotIn("pattern_map", data)
+        matcher = load_matcher_from_file(path)
+        self.assertEqual(
+            matcher.pattern_map, dict(zip(data["pattern_states"], ["ABAB", "BC"]))
+        )
+        self.assertEqual(list(matcher.search("ABABC")), [(0, "ABAB"), (3, "BC")])
+        # The pattern ids follow the order of the patterns in the file
+        self.assertEqual(matcher.patterns, ["ABAB", "BC"])
+        self.assertEqual(list(matcher.search_ids("ABABC")), [(0, 0), (3, 1)])
+
+    def test_loaded_matchers_are_shared(self):
+        """Test loading a DFA file again reuses the matcher until it is modified"""
+        # The file is modified, it gets its own path
+        path = self.path("modified.json")
+        with mock.patch("builtins.print"):
+            build_dfa(["ABAB"], path, "aho-corasick", True, "ABC")
+        matcher = load_matcher_from_file(path)
+        self.assertIs(load_matcher_from_file(path), matcher)
+        self.assertIsNot(load_matcher_from_file(path, precompute=False), matcher)
+
+        with mock.patch("builtins.print"):
+            build_dfa(["ABC"], path, "aho-corasick", True, "ABC")
+        os.utime(path, ns=(0, 0))
+        reloaded = load_matcher_from_file(path)
+        self.assertIsNot(reloaded, matcher)
+        self.assertEqual(list(reloaded.search("ABCABAB")), [(0, "ABC")])
+
+    def test_invalidate_loaded_matchers(self):
+        """Test the loaded matchers are kept until they are invalidated"""
+        path = self.dfa_files["kmp"]
+        matcher = load_matcher_from_file(path)
+        self.assertIs(load_matcher_from_file(path), matcher)
+
+        invalidate_loaded_matchers()
+        self.assertIsNot(load_matcher_from_file(path), matcher)
+
+    def test_load_dictionary_dfa(self):
+        """Test DFA files holding the dictionary representation still load"""
+        matcher = AhoCorasickMatcher(["ABAB"], True, "ABC")
+        data = {
+            "algorithm": "aho-corasick",
+            "patterns": ["ABAB"],
+            "dfa": matcher.dfa.to_dict(),
+            "fail_functions": matcher.fail_functions,
+            "pattern_map": {str(k): v for k, v in matcher.pattern_map.items()},
+        }
+        path = self.path("dictionary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        loaded = load_matcher_from_file(path)
+        self.assertEqual(list(loaded.search("ABABAB")), [(0, "ABAB"), (2, "ABAB")])
+
+
+class TestSearchWithPatterns(unittest.TestCase):
+    """Unit tests for search_with_patterns."""
+
+    def test_matches_are_lazy(self):
+        """Test the matches are produced as they are consumed"""
+        for algorithm in ("kmp", "aho-corasick"):
+            matches = search_with_patterns("ABCABC", ["ABC"], algorithm, True, "ABC")
+            self.assertNotIsInstance(matches, list)
+            self.assertEqual(next(matches), (0, "ABC"))
+            self.assertEqual(list(matches), [(3, "ABC")])
+
+    def test_single_pattern_uses_kmp(self):
+        """Test a single precomputed pattern is searched with KMP"""
+        with mock.patch(
+            "strings.stringsapp.build_matcher", wraps=build_matcher
+        ) as build:
+            matches = search_with_patterns("ABABA", ["ABA"], "aho-corasick", True)
+            self.assertEqual(list(matches), [(0, "ABA"), (2, "ABA")])
+            self.assertEqual(build.call_args.args[1], "kmp")
+            # Several patterns, or lazy transitions, stay on Aho-Corasick
+            for patterns, precompute in ((["ABA", "BA"], True), (["ABA"], False)):
+                search_with_patterns("ABABA", patterns, "aho-corasick", precompute)
+                self.assertEqual(build.call_args.args[1], "aho-corasick")
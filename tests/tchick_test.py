@@ -0,0 +1,75 @@
+"""Unit tests for the command-line interface."""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tchick import main
+
+
+class TestStrsearch(unittest.TestCase):
+    """Unit tests for the strsearch command."""
+
+    def strsearch(self, *args: str, stdin: bytes = b"") -> str:
+        """Run strsearch with the arguments, and return its output."""
+        stdin_mock = mock.Mock(buffer=io.BytesIO(stdin))
+        with mock.patch("sys.argv", ["tchick", "strsearch", *args]), mock.patch(
+            "sys.stdin", stdin_mock
+        ), mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            main()
+        return stdout.getvalue()
+
+    def test_utf8_input(self):
+        """Test UTF-8 files and stdin are searched with a non-ASCII alphabet"""
+        text = "αβγαβ βγ"
+        expected = [
+            "Pattern 'αβ' found at position 0",
+            "Pattern 'βγ' found at position 1",
+            "Pattern 'αβ' found at position 3",
+            "Pattern 'βγ' found at position 6",
+            "",
+            "Total matches found: 4",
+        ]
+        args = ("--patterns", "αβ", "βγ", "--alphabet", "αβγ ")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "input.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            output = self.strsearch(*args, "-f", path)
+        self.assertEqual(output.splitlines(), expected)
+        output = self.strsearch(*args, stdin=text.encode("utf-8"))
+        self.assertEqual(output.splitlines(), expected)
+
+    def test_ascii_input(self):
+        """Test ASCII alphabets search the bytes of files and stdin"""
+        output = self.strsearch("--patterns", "ABC", stdin=b"ABCABC")
+        self.assertEqual(
+            output.splitlines(),
+            [
+                "Pattern 'ABC' found at position 0",
+                "Pattern 'ABC' found at position 3",
+                "",
+                "Total matches found: 2",
+            ],
+        )
+
+    def test_output_file(self):
+        """Test the output file is only replaced once the search succeeds"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "results.csv")
+            args = ("--patterns", "AB", "BC", "--output-format", "csv")
+            self.strsearch(*args, "-t", "ABC", "--output-file", path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "position,pattern\n0,AB\n1,BC\n")
+            # Text outside of the alphabet fails the search
+            with self.assertRaises(ValueError):
+                self.strsearch(*args, "-t", "ABXAB", "--output-file", path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "position,pattern\n0,AB\n1,BC\n")
+            self.assertEqual(os.listdir(tmp_dir), ["results.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()